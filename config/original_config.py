@@ -11,6 +11,13 @@ load_dotenv()
 LAT = float(os.getenv("LAT", 51.47))
 LON = float(os.getenv("LON", -0.4543))
 
+# ===== SITE REGISTRY =====
+# Multi-site runs read sites from a JSON file: [{"id": "heathrow", "name": "...", "latitude": 51.47, "longitude": -0.4543}, ...]
+# The default site (LAT/LON above) keeps the original single-site file layout
+DEFAULT_SITE_ID = os.getenv("DEFAULT_SITE_ID", "heathrow")
+SITES_FILE = os.getenv("SITES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sites.json"))
+SITE_BATCH_SIZE = int(os.getenv("SITE_BATCH_SIZE", 10))  # Coordinates per multi-location Open-Meteo request
+
 # Parse variable list safely from string
 try:
     VARIABLES = ast.literal_eval(os.getenv("VARIABLES", '["temperature_2m", "surface_pressure", "precipitation", "wind_speed_10m"]'))
@@ -57,5 +64,64 @@ FORECAST_PAST_DAYS = int(os.getenv("FORECAST_PAST_DAYS", 3))
 FORECAST_FUTURE_DAYS = int(os.getenv("FORECAST_FUTURE_DAYS", 5))
 START_YEAR = int(os.getenv("START_YEAR", 2017))
 START_MONTH = int(os.getenv("START_MONTH", 1))
+INCREMENTAL_INGESTION = os.getenv("INCREMENTAL_INGESTION", "true").strip().lower() in ("1", "true", "yes")
+
+# ===== HTTP CACHE CONFIGURATION =====
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+HTTP_CACHE_BACKEND = os.getenv("HTTP_CACHE_BACKEND", "sqlite")  # sqlite or filesystem
+HTTP_CACHE_ARCHIVE_TTL_HOURS = float(os.getenv("HTTP_CACHE_ARCHIVE_TTL_HOURS", 168))
+HTTP_CACHE_FORECAST_TTL_MINUTES = float(os.getenv("HTTP_CACHE_FORECAST_TTL_MINUTES", 15))
+HTTP_CACHE_ARCHIVE_LAG_DAYS = int(os.getenv("HTTP_CACHE_ARCHIVE_LAG_DAYS", 2))  # Archive requests ending this recently are not cached
+
+# ===== HTTP RESILIENCE CONFIGURATION =====
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))  # Seconds per request
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", 1.0))  # Seconds; doubles per attempt, with full jitter
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 30.0))
+HTTP_BREAKER_THRESHOLD = int(os.getenv("HTTP_BREAKER_THRESHOLD", 5))  # Consecutive failures before failing fast
+HTTP_BREAKER_COOLDOWN = float(os.getenv("HTTP_BREAKER_COOLDOWN", 60.0))
+HOURLY_RUN_BUDGET_SECONDS = float(os.getenv("HOURLY_RUN_BUDGET_SECONDS", 600))  # Total fetch time for one hourly run
+
+# ===== STORAGE CONFIGURATION =====
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "csv").strip().lower()
+if STORAGE_FORMAT not in ("csv", "parquet", "arrow"):
+    print(f"⚠️ Invalid STORAGE_FORMAT in .env: {STORAGE_FORMAT}. Defaulting to csv.")
+    STORAGE_FORMAT = "csv"
+STORAGE_COMPRESSION = os.getenv("STORAGE_COMPRESSION", "zstd")
+STORAGE_FLOAT32 = os.getenv("STORAGE_FLOAT32", "false").strip().lower() in ("1", "true", "yes")  # Columnar formats only
+
+# ===== LOGGING CONFIGURATION =====
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()
+if LOG_FORMAT not in ("text", "jsonl"):
+    print(f"⚠️ Invalid LOG_FORMAT in .env: {LOG_FORMAT}. Defaulting to text.")
+    LOG_FORMAT = "text"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))  # Rotate the log file beyond this size
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 0.5))  # Seconds the writer waits to batch records
+
+# ===== CONCURRENCY CONFIGURATION =====
+HISTORICAL_MAX_WORKERS = int(os.getenv("HISTORICAL_MAX_WORKERS", 8))  # Parallel month fetches during backfill
+
+# ===== MODEL SCORING CONFIGURATION =====
+LSTM_SCORING_BATCH_SIZE = int(os.getenv("LSTM_SCORING_BATCH_SIZE", 256))  # Windows per LSTM-AE forward pass
+LSTM_SCORING_WORKERS = int(os.getenv("LSTM_SCORING_WORKERS", 1))  # Batches scored concurrently (1 = serial)
+LSTM_INFERENCE_STRIDE = int(os.getenv("LSTM_INFERENCE_STRIDE", 1))  # Stride between windows covering the forecast
+LSTM_INFERENCE_MIN_COVERAGE = int(os.getenv("LSTM_INFERENCE_MIN_COVERAGE", 1))  # Windows per forecast hour, at least
+LSTM_WINDOW_CACHE_SIZE = int(os.getenv("LSTM_WINDOW_CACHE_SIZE", 4096))  # Scored windows kept between hourly runs
+LSTM_RUNTIME = os.getenv("LSTM_RUNTIME", "auto").strip().lower()  # auto, keras, tflite or onnx
+IF_RUNTIME = os.getenv("IF_RUNTIME", "auto").strip().lower()  # auto, sklearn or arrays
+
+# ===== XAI CONFIGURATION =====
+XAI_SHAP_CACHE_SIZE = int(os.getenv("XAI_SHAP_CACHE_SIZE", 100000))  # Explained rows kept next to the inference output
+XAI_PLOT_WORKERS = int(os.getenv("XAI_PLOT_WORKERS", 4))  # Processes rendering XAI plots (1 = in the main process)
+
+# Labels explained eagerly in each run; other rows are explained on demand
+try:
+    XAI_EAGER_LABELS = ast.literal_eval(os.getenv("XAI_EAGER_LABELS", '["Point anomaly", "Pattern anomaly", "Compound anomaly"]'))
+    if not isinstance(XAI_EAGER_LABELS, list):
+        raise ValueError
+except (SyntaxError, ValueError):
+    print("⚠️ Warning: XAI_EAGER_LABELS in .env is invalid. Using default list.")
+    XAI_EAGER_LABELS = ["Point anomaly", "Pattern anomaly", "Compound anomaly"]
 
 
@@ -13,7 +13,7 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 # import json
 # import time
-# import os
+import os
 
 # ================================================================================================
 # STYLING AND PAGE CONFIGURATION
@@ -188,15 +188,18 @@ st.markdown("""
 # DATA LOADING AND PROCESSING FUNCTIONS - ENHANCED WITH FULL INTEGRATION
 # ================================================================================================
 
+# Written by the XAI stage (scripts/xai/explain.py), including hours explained on demand
+XAI_FILE = "outputs/xai/tpa-treeshap-rea-final.csv"
+
 @st.cache_data
 def load_sample_data():
     """Enhanced Data Loading with Jeremy's ML Pipeline and Marie's XAI Integration"""
     try:
         # CSV file path - Note for Jeremy: Update this when shared on your github repo
-        file_path = "outputs/xai/tpa-treeshap-rea-final.csv"
+        file_path = XAI_FILE
 
         try:
-            # Load the CSV file
+            # Load the CSV file (the only output the XAI stage writes, on-demand explanations included)
             data = pd.read_csv(file_path)
             # Try different date formats - first try ISO format, then DD/MM/YYYY format
             try:
@@ -394,6 +397,20 @@ def load_marie_xai_data():
     return explanations
 
 
+@st.cache_resource(max_entries=1)
+def load_xai_explainer(file_mtime):
+    """On-demand XAI (scripts/xai/explain.py) over the XAI output; reloaded whenever the file changes."""
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    try:
+        from scripts.xai.explain import open_xai_explainer
+        return open_xai_explainer(XAI_FILE)
+    except Exception as e:
+        # Model file or XAI dependencies missing: the dashboard keeps working with the saved explanations
+        st.sidebar.warning(f"⚠️ On-demand XAI unavailable: {e}")
+        return None
+
+
 # ================================================================================================
 # ENHANCED VISUALISATION FUNCTIONS - JEREMY'S ALTAIR INTEGRATION
 # ================================================================================================
@@ -1333,6 +1350,38 @@ def main():
             else:
                 st.info("No anomalies detected in current dataset for detailed analysis.")
 
+        # Hours outside the eager XAI policy (Normal) are explained on request and written back to the XAI output
+        with st.expander("🧠 Explain Any Hour (on demand XAI)"):
+            selected_idx = st.selectbox(
+                "Select an hour to explain:",
+                weather_data.index.tolist(),
+                format_func=lambda x: f"{weather_data.iloc[x]['date'].strftime('%Y-%m-%d %H:%M')} ({weather_data.iloc[x]['anomaly_label']})",
+                key="on_demand_xai_hour"
+            )
+            selected_hour = weather_data.iloc[selected_idx]
+            explanation = None
+            if 'treeshap_summary' in selected_hour and pd.notna(selected_hour['treeshap_summary']):
+                explanation = selected_hour
+            elif os.path.exists(XAI_FILE) and st.button("Explain this hour", key="on_demand_xai_button"):
+                explainer = load_xai_explainer(os.path.getmtime(XAI_FILE))
+                if explainer is not None:
+                    with st.spinner("Running TPA, TreeSHAP and REA for this hour..."):
+                        explanation = explainer.explain(selected_idx)
+                    load_sample_data.clear()  # the explanation is now saved in the XAI output
+
+            if explanation is not None:
+                for title, column in [("**🌳 Tree Path Analysis:**", "tpa_summary"),
+                                      ("**🧠 TreeSHAP Analysis:**", "treeshap_summary"),
+                                      ("**🔬 Reconstruction Error Analysis:**", "rea_summary")]:
+                    if pd.notna(explanation.get(column)) and explanation.get(column):
+                        st.markdown(title)
+                        st.info(explanation[column])
+                plot_path = explanation.get('treeshap_plot_path')
+                if isinstance(plot_path, str) and os.path.exists(plot_path):
+                    st.image(plot_path)
+            else:
+                st.caption("This hour has not been explained yet.")
+
         # Model Configuration
         with st.expander("⚙️ Model Configuration & Technical Details"):
             col1, col2 = st.columns(2)
@@ -4,30 +4,50 @@ Hourly ingestion of Open-Meteo forecast and historical data.
 Generates:
 - A trimmed 72-hour forecast starting from the anchor time (inclusive).
 - A 1440-hour rolling historical window ending at the anchor time (exclusive).
+
+In incremental mode the most recent saved rolling window is reused as state: only the
+archive days that have left the forecast backfill band are re-fetched, and the window
+slides forward by the number of hours elapsed since the previous run.
+
+With a site registry (utils/sites.py) sites are fetched in batches, one multi-location
+request per batch and endpoint, with batches running concurrently. Sites whose previous
+windows end at the same hour share requests; outputs are saved per site.
 """
 
 
 import os
 import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from config.original_config import (
-    LAT, LON, VARIABLES, MODEL_FORECAST, MODEL_HISTORICAL,
+    VARIABLES, MODEL_FORECAST, MODEL_HISTORICAL,
     ROLLING_WINDOW_HOURS, FORECAST_BACKFILL_HOURS, FORECAST_TRIM_HOURS,
     FORECAST_PAST_DAYS, FORECAST_FUTURE_DAYS, HISTORICAL_API_URL,
-    FORECAST_API_URL, TIME_ZONE, ANCHOR_TIME
+    FORECAST_API_URL, TIME_ZONE, ANCHOR_TIME, INCREMENTAL_INGESTION, HOURLY_RUN_BUDGET_SECONDS,
+    HISTORICAL_MAX_WORKERS, SITE_BATCH_SIZE
 )
-from utils.find_root import find_project_root
 from utils.logger import log_event
-from utils.fetch_dataframe import fetch_hourly_dataframe
-from utils.save_file import save_csv
+from utils.fetch_dataframe import fetch_site_dataframes
+from utils.http_client import FetchError, start_run_budget, fetch_metrics
+from utils.storage import save_dataframe, read_dataframe, list_artefacts
+from utils.sites import default_site, load_sites, batched, site_subdir, site_dir
+
+ROLLING_WINDOW_SUBDIR = "processed/rolling_window"
+ROLLING_WINDOW_PREFIX = "baseline_rolling_1440h_until_"
+
+def _check_site_frames(frames: dict, label: str, module: str):
+    for site_id, df in frames.items():
+        if df.empty:
+            log_event(f"Warning: Empty {label} dataframe returned for {site_id}.", module=module)
+        if df.isna().any().any():
+            log_event(f"Warning: Missing values found in {label} data for {site_id}.", module=module)
 
-def fetch_historical_data(start_date: datetime, end_date: datetime) -> pd.DataFrame:
-    """Fetch historical hourly data from Open-Meteo Archive API."""
-    log_event(f"Fetching historical data from {start_date.date()} to {end_date.date()}", module="rolling_window_ingestion")
+def fetch_historical_data(start_date: datetime, end_date: datetime, sites: list) -> dict:
+    """Fetch historical hourly data for a batch of sites from Open-Meteo Archive API (site id -> DataFrame)."""
+    log_event(f"Fetching historical data from {start_date.date()} to {end_date.date()} ({len(sites)} sites)", module="rolling_window_ingestion")
 
     params = {
-        "latitude": LAT,
-        "longitude": LON,
         "start_date": start_date.strftime("%Y-%m-%d"),
         "end_date": end_date.strftime("%Y-%m-%d"),
         "hourly": ",".join(VARIABLES),
@@ -35,20 +55,15 @@ def fetch_historical_data(start_date: datetime, end_date: datetime) -> pd.DataFr
         "timezone": TIME_ZONE.zone,
     }
 
-    df = fetch_hourly_dataframe(HISTORICAL_API_URL, params)
-    if df.empty:
-        log_event("Warning: Empty historical dataframe returned.", module="rolling_window_ingestion")
-    if df.isna().any().any():
-        log_event("Warning: Missing values found in historical data.", module="rolling_window_ingestion")
-    return df
+    frames = fetch_site_dataframes(HISTORICAL_API_URL, params, sites)
+    _check_site_frames(frames, "historical", "rolling_window_ingestion")
+    return frames
 
-def fetch_forecast_data() -> pd.DataFrame:
-    """Fetch past and future forecast data from Open-Meteo Forecast API."""
-    log_event("Fetching past 3 days + next 5 days forecast", module="forecast_ingestion")
+def fetch_forecast_data(sites: list) -> dict:
+    """Fetch past and future forecast data for a batch of sites from Open-Meteo Forecast API (site id -> DataFrame)."""
+    log_event(f"Fetching past 3 days + next 5 days forecast ({len(sites)} sites)", module="forecast_ingestion")
 
     params = {
-        "latitude": LAT,
-        "longitude": LON,
         "hourly": ",".join(VARIABLES),
         "models": MODEL_FORECAST,
         "past_days": FORECAST_PAST_DAYS,
@@ -56,21 +71,18 @@ def fetch_forecast_data() -> pd.DataFrame:
         "timezone": TIME_ZONE.zone,
     }
 
-    df = fetch_hourly_dataframe(FORECAST_API_URL, params)
-    if df.empty:
-        log_event("Warning: Empty forecast dataframe returned.", module="forecast_ingestion")
-    if df.isna().any().any():
-        log_event("Warning: Missing values found in forecast data.", module="forecast_ingestion")
-    return df
+    frames = fetch_site_dataframes(FORECAST_API_URL, params, sites)
+    _check_site_frames(frames, "forecast", "forecast_ingestion")
+    return frames
 
-def save_trimmed_forecast(df: pd.DataFrame, anchor_time: datetime):
+def save_trimmed_forecast(df: pd.DataFrame, anchor_time: datetime, site_id=None):
     """Save 72-hour trimmed forecast slice."""
     trimmed = df[(df["date"] >= anchor_time) & (df["date"] < anchor_time + timedelta(hours=FORECAST_TRIM_HOURS))].copy()
-    fname = f"forecast_72h_from_{anchor_time.strftime('%Y%m%d_%H%M')}.csv"
-    save_csv(trimmed, fname, "raw/forecast")
+    fname = f"forecast_72h_from_{anchor_time.strftime('%Y%m%d_%H%M')}"
+    fname = os.path.basename(save_dataframe(trimmed, fname, site_subdir(site_id, "raw/forecast")))
     log_event(f"Saved 72h forecast: {fname} ({len(trimmed)} rows)", module="forecast_ingestion")
 
-def save_rolling_window(df: pd.DataFrame, anchor_time: datetime):
+def save_rolling_window(df: pd.DataFrame, anchor_time: datetime, site_id=None):
     """Save 1440-hour historical window ending at anchor_time (exclusive)."""
     start = anchor_time - timedelta(hours=ROLLING_WINDOW_HOURS)
     window = df[(df["date"] >= start) & (df["date"] < anchor_time)].copy()
@@ -80,30 +92,156 @@ def save_rolling_window(df: pd.DataFrame, anchor_time: datetime):
     if abs(actual - expected) > 1:
         log_event(f"Rolling window has {actual} rows, expected {expected}. Δ={actual - expected}", module="rolling_window_ingestion")
 
-    fname = f"baseline_rolling_1440h_until_{(anchor_time - timedelta(hours=1)).strftime('%Y%m%d_%H%M')}.csv"
-    save_csv(window, fname, "processed/rolling_window")
+    fname = f"{ROLLING_WINDOW_PREFIX}{(anchor_time - timedelta(hours=1)).strftime('%Y%m%d_%H%M')}"
+    fname = os.path.basename(save_dataframe(window, fname, site_subdir(site_id, ROLLING_WINDOW_SUBDIR)))
     log_event(f"Saved rolling window: {fname} ({len(window)} rows)", module="rolling_window_ingestion")
 
-def main():
-    log_event("Starting hourly ingestion anchored at latest full hour.", module="forecast_ingestion")
+def load_latest_rolling_window(site_id=None):
+    """
+    Load the most recently saved rolling window of a site, used as state for incremental runs.
 
-    # Convert timezone-aware anchor to naive (since data will be timezone-naive)
-    anchor = ANCHOR_TIME.replace(tzinfo=None)  # Remove timezone info
+    - Returns (window_df, until_time) where until_time is the last hour contained in the window.
+    - Returns (None, None) if no rolling window has been saved yet.
+    """
+    window_dir = site_dir(site_id, ROLLING_WINDOW_SUBDIR)
+
+    # Filenames embed YYYYMMDD_HHMM, so lexical order is chronological order
+    files = list_artefacts(window_dir, prefix=ROLLING_WINDOW_PREFIX)
+    if not files:
+        return None, None
+
+    latest = files[-1]
+    stem = os.path.splitext(os.path.basename(latest))[0]
+    until_time = datetime.strptime(stem[len(ROLLING_WINDOW_PREFIX):], "%Y%m%d_%H%M")
+    return read_dataframe(latest), until_time
+
+def can_slide_window(until_time: datetime, anchor: datetime) -> bool:
+    """Check whether a previous window ending at until_time can be slid forward to anchor."""
+    elapsed_hours = (anchor - (until_time + timedelta(hours=1))) / timedelta(hours=1)
+    return 0 <= elapsed_hours < ROLLING_WINDOW_HOURS - FORECAST_BACKFILL_HOURS
+
+def build_full_dataframes(anchor: datetime, sites: list) -> dict:
+    """Fetch the full 1441-hour archive span plus forecast for a batch of sites and merge them (archive takes priority)."""
     hist_start = anchor - timedelta(hours=ROLLING_WINDOW_HOURS + 1)
     hist_end = anchor - timedelta(hours=FORECAST_BACKFILL_HOURS)
 
-    hist_df = fetch_historical_data(hist_start, hist_end)
-    forecast_df = fetch_forecast_data()
+    hist_frames = fetch_historical_data(hist_start, hist_end, sites)
+    forecast_frames = fetch_forecast_data(sites)
+
+    return {
+        site["id"]: pd.concat([hist_frames[site["id"]], forecast_frames[site["id"]]]).drop_duplicates(subset="date").sort_values("date")
+        for site in sites
+    }
+
+def build_incremental_dataframes(anchor: datetime, prev_until: datetime, prev_windows: dict, sites: list) -> dict:
+    """
+    Slide previously saved rolling windows (all ending at prev_until) forward to the new anchor.
 
-    merged_df = pd.concat([hist_df, forecast_df]).drop_duplicates(subset="date").sort_values("date")
+    - Rows older than the previous run's backfill band are reused from disk unchanged.
+    - Archive data is fetched only from the start of that band (day-aligned) up to the new backfill cutoff.
+    - The refreshed tail is merged exactly as in a full run, so archive values replace forecast values once available.
+    """
+    prev_anchor = prev_until + timedelta(hours=1)
+    refresh_start = (prev_anchor - timedelta(hours=FORECAST_BACKFILL_HOURS)).replace(hour=0, minute=0, second=0, microsecond=0)
+    hist_end = anchor - timedelta(hours=FORECAST_BACKFILL_HOURS)
 
-    if merged_df.isna().any().any():
-        log_event("Warning: NaNs found in merged dataframe.", module="data_integrity")
+    new_hours = int((anchor - prev_anchor) / timedelta(hours=1))
+    log_event(
+        f"Incremental update: sliding window by {new_hours}h, refreshing archive from {refresh_start.date()}",
+        module="rolling_window_ingestion"
+    )
+
+    delta_frames = fetch_historical_data(refresh_start, hist_end, sites)
+    forecast_frames = fetch_forecast_data(sites)
+
+    merged = {}
+    for site in sites:
+        tail_df = pd.concat([delta_frames[site["id"]], forecast_frames[site["id"]]]).drop_duplicates(subset="date")
+        tail_df = tail_df[tail_df["date"] >= refresh_start]
+        prev_window = prev_windows[site["id"]]
+        kept_df = prev_window[prev_window["date"] < refresh_start]
+        merged[site["id"]] = pd.concat([kept_df, tail_df]).sort_values("date")
+    return merged
+
+def ingest_batch(anchor: datetime, sites: list, prev_until=None, prev_windows=None):
+    """Build and save the forecast and rolling window of a batch of sites sharing the same previous state."""
+    if prev_until is not None:
+        merged = build_incremental_dataframes(anchor, prev_until, prev_windows, sites)
+    else:
+        merged = build_full_dataframes(anchor, sites)
+
+    for site in sites:
+        merged_df = merged[site["id"]]
+        if merged_df.isna().any().any():
+            log_event(f"Warning: NaNs found in merged dataframe for {site['id']}.", module="data_integrity")
+        save_trimmed_forecast(merged_df, anchor, site["id"])
+        save_rolling_window(merged_df, anchor, site["id"])
+
+def plan_batches(anchor: datetime, sites: list, incremental: bool, batch_size: int = SITE_BATCH_SIZE) -> list:
+    """
+    Group sites into request batches of (sites, prev_until, prev_windows).
+
+    - In incremental mode, sites are grouped by the end of their last saved window so each batch
+      shares one archive range; sites without a usable window get a full fetch (prev_until None).
+    """
+    groups = {}
+    for site in sites:
+        prev_window, prev_until = load_latest_rolling_window(site["id"]) if incremental else (None, None)
+        if prev_window is None or not can_slide_window(prev_until, anchor):
+            if incremental:
+                log_event(f"No usable previous rolling window for {site['id']}; running full ingestion.", module="rolling_window_ingestion")
+            prev_window, prev_until = None, None
+        group = groups.setdefault(prev_until, ([], {}))
+        group[0].append(site)
+        group[1][site["id"]] = prev_window
+
+    return [
+        (batch, prev_until, {site["id"]: windows[site["id"]] for site in batch})
+        for prev_until, (group_sites, windows) in groups.items()
+        for batch in batched(group_sites, batch_size)
+    ]
+
+def main(incremental: bool = INCREMENTAL_INGESTION, sites=None, max_workers: int = HISTORICAL_MAX_WORKERS):
+    """
+    Run the hourly ingestion for `sites` (default: the single configured LAT/LON site).
+
+    - Batches of sites are fetched concurrently, each with one request per endpoint.
+    - A failed batch (fetch layer error, or HTTP error left after the retries) does not stop the others;
+      the first such error is re-raised once all batches finish.
+    """
+    sites = sites or [default_site()]
+    log_event(f"Starting hourly ingestion anchored at latest full hour ({len(sites)} sites).", module="forecast_ingestion")
 
-    save_trimmed_forecast(merged_df, anchor)
-    save_rolling_window(merged_df, anchor)
+    # Convert timezone-aware anchor to naive (since data will be timezone-naive)
+    anchor = ANCHOR_TIME.replace(tzinfo=None)  # Remove timezone info
 
+    # Bound total fetch time so a slow API cannot push the job past its hourly slot
+    start_run_budget(HOURLY_RUN_BUDGET_SECONDS)
+
+    batches = plan_batches(anchor, sites, incremental)
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as pool:
+        futures = {
+            pool.submit(ingest_batch, anchor, batch, prev_until, prev_windows): batch
+            for batch, prev_until, prev_windows in batches
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except (FetchError, requests.RequestException) as e:
+                site_ids = ", ".join(site["id"] for site in futures[future])
+                log_event(f"Failed to fetch data for hourly ingestion ({site_ids}): {e}", module="forecast_ingestion", **fetch_metrics())
+                errors.append(e)
+
+    metrics = fetch_metrics()
+    log_event(
+        f"HTTP: {metrics['hits']} cache hits, {metrics['misses']} fetched, {metrics['retries']} retries",
+        module="forecast_ingestion", **metrics
+    )
+    if errors:
+        raise errors[0]
     log_event("Completed hourly ingestion process.", module="forecast_ingestion")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Ingests every site in the registry (just LAT/LON when no SITES_FILE exists)
+    main(sites=load_sites())
@@ -1,53 +1,71 @@
 """
 Monthly ingestion of IFS historical data from Open-Meteo.
 
-Fetches and saves monthly CSVs from February 2017 up to the latest full month.
+Fetches and saves monthly files (CSV, Parquet or Arrow per STORAGE_FORMAT) from February 2017 up to the latest full month.
 Skips months where complete data is not yet available due to API lag.
+Months are fetched concurrently by a bounded worker pool sharing one pooled, cached HTTP session.
+Each month is appended as a partition of the historical store (see utils/historical_store.py).
+
+With a site registry (utils/sites.py) every (month, batch of sites) pair is one multi-location
+request, and each site's data goes to that site's own partitions.
 """
 
 
 import os
 import calendar
-import pandas as pd
-import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from config.original_config import (
-    LAT, LON, VARIABLES, TIME_ZONE,
+    VARIABLES, TIME_ZONE,
     MODEL_HISTORICAL, HISTORICAL_API_URL,
-    START_YEAR, START_MONTH
+    START_YEAR, START_MONTH, HISTORICAL_MAX_WORKERS, SITE_BATCH_SIZE
 )
-from utils.find_root import find_project_root
 from utils.logger import log_event
-from utils.save_file import save_csv
+from utils.storage import find_artefact
+from utils.historical_store import append_partition, store_dir
+from utils.http_client import fetch_metrics
+from utils.fetch_dataframe import fetch_site_dataframes
+from utils.sites import default_site, load_sites, batched
 
 # Compute cutoff: API lags by 2 days, so exclude current or partial month
 today_utc = datetime.utcnow().date()
 latest_safe_date = today_utc - timedelta(days=2)
 latest_full_month = datetime(latest_safe_date.year, latest_safe_date.month, 1).date()
 
-def fetch_month(year: int, month: int):
-    """Fetch a month's historical data using Open-Meteo REST API and save as CSV."""
+def fetch_month(year: int, month: int, sites=None) -> dict:
+    """
+    Fetch a month's historical data for a batch of sites in one Open-Meteo request and save each site's partition.
+
+    - `sites` defaults to the single configured LAT/LON site; sites that already have the month are not requested.
+    - Uses the shared HTTP client, so concurrent workers share pooled connections and the response cache.
+    - Returns a mapping of site id to status ('saved', 'exists', 'partial', 'incomplete' or 'failed') for the run summary.
+    """
+    sites = sites or [default_site()]
     start_date = datetime(year, month, 1).date()
     end_day = calendar.monthrange(year, month)[1]
     end_date = datetime(year, month, end_day).date()
 
     # Skip partial/incomplete months
     if end_date >= latest_safe_date:
-        return
-
-    filename = f"IFS_{year}_{month:02d}.csv"
-    output_dir = os.path.join(find_project_root(), "data", "raw", "historical")
-    file_path = os.path.join(output_dir, filename)
+        return {site["id"]: "partial" for site in sites}
+
+    filename = f"IFS_{year}_{month:02d}"
+    statuses, missing = {}, []
+    for site in sites:
+        existing = find_artefact(store_dir(site["id"]), filename)
+        if existing is not None:
+            log_event(f"Skipped {os.path.basename(existing)} for {site['id']} – already exists.", module="historical_ingestion")
+            statuses[site["id"]] = "exists"
+        else:
+            missing.append(site)
 
-    if os.path.exists(file_path):
-        log_event(f"Skipped {filename} – already exists.", module="historical_ingestion")
-        return
+    if not missing:
+        return statuses
 
-    log_event(f"Fetching historical data for {year}-{month:02d}", module="historical_ingestion")
+    log_event(f"Fetching historical data for {year}-{month:02d} ({len(missing)} sites)", module="historical_ingestion")
 
     params = {
-        "latitude": LAT,
-        "longitude": LON,
         "start_date": start_date.isoformat(),
         "end_date": end_date.isoformat(),
         "hourly": ",".join(VARIABLES),
@@ -56,45 +74,89 @@ def fetch_month(year: int, month: int):
     }
 
     try:
-        response = requests.get(HISTORICAL_API_URL, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-
-        if "hourly" not in data or "time" not in data["hourly"]:
-            raise ValueError("Malformed API response – missing 'hourly' or 'time'.")
-
-        df = pd.DataFrame(data["hourly"])
-        df.rename(columns={"time": "date"}, inplace=True)
-        df["date"] = pd.to_datetime(df["date"]) #.dt.tz_localize(TIME_ZONE.zone, nonexistent="shift_forward") to localise to London time
+        # Duplicated hours are kept here and reported by the historical merge checks
+        frames = fetch_site_dataframes(HISTORICAL_API_URL, params, missing, deduplicate=False) #.dt.tz_localize(TIME_ZONE.zone, nonexistent="shift_forward") on 'date' to localise to London time
+    except Exception as e:
+        log_event(f"Failed to fetch data for {year}-{month:02d}: {e}", module="historical_ingestion")
+        statuses.update({site["id"]: "failed" for site in missing})
+        return statuses
 
-        # Validate expected number of rows
-        expected_rows = calendar.monthrange(year, month)[1] * 24
+    # Validate expected number of rows
+    expected_rows = calendar.monthrange(year, month)[1] * 24
+    for site in missing:
+        df = frames[site["id"]]
         if len(df) < expected_rows:
             log_event(
-                f"Warning: {filename} contains {len(df)} rows, expected {expected_rows}. Skipping save.",
+                f"Warning: {filename} for {site['id']} contains {len(df)} rows, expected {expected_rows}. Skipping save.",
                 module="historical_ingestion"
             )
-            return
-
-        save_csv(df, filename, "raw/historical")
-        log_event(f"Saved monthly data: {filename}", module="historical_ingestion")
-
-    except Exception as e:
-        log_event(f"Failed to fetch data for {year}-{month:02d}: {e}", module="historical_ingestion")
-
-def run_monthly_ingestion():
-    log_event("Started monthly historical ingestion.", module="historical_ingestion")
-
+            statuses[site["id"]] = "incomplete"
+            continue
+
+        try:
+            saved_path = append_partition(df, year, month, site["id"])
+        except Exception as e:
+            log_event(f"Failed to save data for {site['id']} {year}-{month:02d}: {e}", module="historical_ingestion")
+            statuses[site["id"]] = "failed"
+            continue
+        log_event(f"Saved monthly data: {os.path.basename(saved_path)} ({site['id']})", module="historical_ingestion")
+        statuses[site["id"]] = "saved"
+    return statuses
+
+def months_to_fetch():
+    """List (year, month) pairs from the configured start month up to the latest full month."""
+    months = []
     current = datetime(START_YEAR, START_MONTH, 1).date()
     while current < latest_full_month:
-        fetch_month(current.year, current.month)
+        months.append((current.year, current.month))
         # Advance to next month
         if current.month == 12:
             current = datetime(current.year + 1, 1, 1).date()
         else:
             current = datetime(current.year, current.month + 1, 1).date()
-
+    return months
+
+def run_monthly_ingestion(max_workers: int = HISTORICAL_MAX_WORKERS, sites=None, batch_size: int = SITE_BATCH_SIZE) -> dict:
+    """
+    Backfill all missing months for every site, fetching up to `max_workers` requests concurrently.
+
+    - `sites` defaults to the single configured site; each request covers one month for up to `batch_size` sites.
+    - All workers share one pooled session (sized by HISTORICAL_MAX_WORKERS); `max_workers=1` reproduces the serial behaviour.
+    - Returns a mapping of 'YYYY-MM' to fetch status ('<site>/YYYY-MM' keys when several sites are ingested)
+      and logs a per-status summary.
+    """
+    sites = sites or [default_site()]
+    log_event(f"Started monthly historical ingestion ({len(sites)} sites, {max_workers} workers).", module="historical_ingestion")
+
+    months = months_to_fetch()
+    results = {}
+    started = datetime.now()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(fetch_month, year, month, batch): (year, month)
+            for year, month in months
+            for batch in batched(sites, batch_size)
+        }
+        for future in as_completed(futures):
+            year, month = futures[future]
+            for site_id, status in future.result().items():
+                key = f"{year}-{month:02d}" if len(sites) == 1 else f"{site_id}/{year}-{month:02d}"
+                results[key] = status
+
+    elapsed = (datetime.now() - started).total_seconds()
+    counts = Counter(results.values())
+    summary = ", ".join(f"{status}={count}" for status, count in sorted(counts.items()))
+    log_event(f"SUMMARY: {len(months)} months x {len(sites)} sites processed in {elapsed:.1f}s ({summary or 'nothing to do'})", module="historical_ingestion")
+    metrics = fetch_metrics()
+    log_event(
+        f"HTTP: {metrics['hits']} cache hits, {metrics['misses']} fetched, {metrics['retries']} retries, "
+        f"{metrics['breaker_trips']} breaker trips",
+        module="historical_ingestion", **metrics
+    )
     log_event("Completed monthly historical ingestion.", module="historical_ingestion")
+    return dict(sorted(results.items()))
 
 if __name__ == "__main__":
-    run_monthly_ingestion()
\ No newline at end of file
+    # Ingests every site in the registry (just LAT/LON when no SITES_FILE exists)
+    run_monthly_ingestion(sites=load_sites())
@@ -0,0 +1,209 @@
+"""
+Feature engineering shared by model training and inference.
+
+Single source for the feature definitions in notebook_jeremy_ETL_and_ML (rolling features
+for training) and notebook_jeremy_inference (statistics frozen at t_now for the forecast).
+
+- compute_if_features: all Isolation Forest features in one pass over the data. Rolling
+  mean/std use pandas' online kernels; the rolling median and IQR of wind share one sorted
+  window (scripts/features/rolling.py) instead of three separate skip-list passes.
+- add_time_features: cyclical hour/month encodings used by the LSTM-AE.
+- compute_tnow_stats / apply_tnow_stats: frozen statistics of the 1440h history window and
+  the forecast-time transformation, including the dashboard band bounds. FeatureState
+  (scripts/features/state.py) maintains the same statistics hour by hour.
+
+Run `python -m scripts.features.engineering` to benchmark against the notebook code on
+8 years of hourly data (the output is checked for bit-for-bit equality).
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from scripts.features.rolling import rolling_median_iqr, trailing_mean
+
+# Rolling windows (hours) and minimum observations, as tuned in the training notebook
+WINDOW_60D = 1440
+MIN_PERIODS_60D = 720
+WINDOW_12H = 12
+MIN_PERIODS_12H = 6
+WINDOW_24H = 24
+MIN_PERIODS_24H = 12
+WIND_SMOOTHING_HOURS = 3
+EPS = 1e-6  # avoids division by zero in the rolling scaling
+
+IF_FEATURES = ["temperature_2m_z", "surface_pressure_z", "wind_r", "precip_z_12h", "precip_z_24h"]
+LSTM_FEATURES = ["temperature_2m", "surface_pressure", "wind_speed_10m", "precip_log"]  # scaled per sequence later
+LSTM_TIME_FEATURES = ["hour_sin", "hour_cos", "month_sin", "month_cos"]
+LSTM_INPUT_COLS = LSTM_FEATURES + LSTM_TIME_FEATURES
+
+def _rolling_zscore(series: pd.Series, window: int, min_periods: int) -> pd.Series:
+    rolling = series.rolling(window=window, min_periods=min_periods)
+    return (series - rolling.mean()) / (rolling.std() + EPS)
+
+def compute_if_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the Isolation Forest features to a copy of an hourly DataFrame.
+
+    - Expects a regular hourly series (e.g. after .asfreq('h')); windows are counted in rows.
+    - Adds temperature_2m_z, surface_pressure_z, wind_r, precip_log, precip_z_12h and precip_z_24h,
+      identical to the training notebook (rows without enough history are NaN, not dropped).
+    """
+    out = df.copy()
+
+    # 60-day rolling z-scores
+    for col in ["temperature_2m", "surface_pressure"]:
+        out[f"{col}_z"] = _rolling_zscore(out[col].astype("float64"), WINDOW_60D, MIN_PERIODS_60D)
+
+    # 3h-smoothed wind, robust-scaled by the 60-day rolling median and IQR
+    wind_smoothed = out["wind_speed_10m"].astype("float64").rolling(window=WIND_SMOOTHING_HOURS, min_periods=1).mean()
+    median, q25, q75 = rolling_median_iqr(wind_smoothed.to_numpy(), WINDOW_60D, MIN_PERIODS_60D)
+    out["wind_r"] = (wind_smoothed - median) / ((q75 - q25) + EPS)
+
+    # log1p precipitation with short-window z-scores for bursts
+    out["precip_log"] = np.log1p(out["precipitation"].astype("float64"))
+    out["precip_z_12h"] = _rolling_zscore(out["precip_log"], WINDOW_12H, MIN_PERIODS_12H)
+    out["precip_z_24h"] = _rolling_zscore(out["precip_log"], WINDOW_24H, MIN_PERIODS_24H)
+    return out
+
+def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds hour/month sine and cosine encodings, taken from a DatetimeIndex or a 'date' column."""
+    out = df.copy()
+    dates = pd.DatetimeIndex(out.index if isinstance(out.index, pd.DatetimeIndex) else out["date"])
+    out["hour"] = np.asarray(dates.hour)
+    out["month"] = np.asarray(dates.month)
+    out["hour_sin"] = np.sin(2 * np.pi * out["hour"] / 24)
+    out["hour_cos"] = np.cos(2 * np.pi * out["hour"] / 24)
+    out["month_sin"] = np.sin(2 * np.pi * out["month"] / 12)
+    out["month_cos"] = np.cos(2 * np.pi * out["month"] / 12)
+    return out
+
+def compute_tnow_stats(df_hist: pd.DataFrame) -> dict:
+    """
+    Frozen statistics of the 1440h history window used to score the forecast.
+
+    - Same keys as `stats_at_tnow` in the inference notebook, plus the dashboard band bounds
+      (temp_q1, temp_upper, wind_p10, wind_upper, press_lower, press_upper).
+    - Wind is smoothed with trailing_mean rather than pandas' running-sum kernel. The two differ
+      by rounding only (below 1e-13 on a 1440h window; pandas' error grows with the series
+      length), and trailing_mean does not depend on where the window starts, so FeatureState
+      (scripts/features/state.py) can reproduce it exactly.
+    """
+    temperature = df_hist["temperature_2m"].astype("float64")
+    pressure = df_hist["surface_pressure"].astype("float64")
+    wind = df_hist["wind_speed_10m"].astype("float64")
+    wind_smoothed = pd.Series(trailing_mean(wind.to_numpy(), WIND_SMOOTHING_HOURS), index=wind.index)
+    precip_log = np.log1p(df_hist["precipitation"].astype("float64"))
+
+    stats = {
+        "temp_mean": temperature.mean(),
+        "temp_std": temperature.std() + EPS,
+        "press_mean": pressure.mean(),
+        "press_std": pressure.std() + EPS,
+        "wind_median": wind_smoothed.median(),
+        "wind_q1": wind_smoothed.quantile(0.25),
+        "wind_q3": wind_smoothed.quantile(0.75),
+        "wind_iqr": wind_smoothed.quantile(0.75) - wind_smoothed.quantile(0.25) + EPS,
+        "precip_log_mean_12h": precip_log.iloc[-12:].mean(),
+        "precip_log_std_12h": precip_log.iloc[-12:].std() + EPS,
+        "precip_log_mean_24h": precip_log.iloc[-24:].mean(),
+        "precip_log_std_24h": precip_log.iloc[-24:].std() + EPS,
+    }
+
+    # Dashboard bands: Tukey fences for temperature and wind, +/- 2 std for pressure
+    temp_q1, temp_q3 = temperature.quantile(0.25), temperature.quantile(0.75)
+    wind_q1, wind_q3 = wind.quantile(0.25), wind.quantile(0.75)
+    stats.update({
+        "temp_q1": temp_q1,
+        "temp_upper": temp_q3 + 1.5 * (temp_q3 - temp_q1),
+        "wind_p10": wind.quantile(0.10),
+        "wind_upper": wind_q3 + 1.5 * (wind_q3 - wind_q1),
+        "press_lower": stats["press_mean"] - 2 * stats["press_std"],
+        "press_upper": stats["press_mean"] + 2 * stats["press_std"],
+    })
+    return stats
+
+def apply_tnow_stats(df_fcst: pd.DataFrame, stats: dict) -> pd.DataFrame:
+    """
+    Adds the IF features and dashboard bounds to a copy of the forecast, using frozen t_now statistics.
+
+    - Wind is smoothed with trailing_mean, as in compute_tnow_stats.
+    """
+    out = df_fcst.copy()
+    out["precip_log"] = np.log1p(out["precipitation"])
+    out["temperature_2m_z"] = (out["temperature_2m"] - stats["temp_mean"]) / stats["temp_std"]
+    out["surface_pressure_z"] = (out["surface_pressure"] - stats["press_mean"]) / stats["press_std"]
+    out["wind_smoothed"] = trailing_mean(out["wind_speed_10m"].to_numpy(dtype="float64"), WIND_SMOOTHING_HOURS)
+    out["wind_r"] = (out["wind_smoothed"] - stats["wind_median"]) / stats["wind_iqr"]
+    out["precip_z_12h"] = (out["precip_log"] - stats["precip_log_mean_12h"]) / stats["precip_log_std_12h"]
+    out["precip_z_24h"] = (out["precip_log"] - stats["precip_log_mean_24h"]) / stats["precip_log_std_24h"]
+
+    out["temp_lower"] = stats["temp_q1"]
+    out["temp_upper"] = stats["temp_upper"]
+    out["wind_lower"] = stats["wind_p10"]
+    out["wind_upper"] = stats["wind_upper"]
+    out["press_lower"] = stats["press_lower"]
+    out["press_upper"] = stats["press_upper"]
+    return out
+
+def _notebook_if_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Training-notebook feature code (steps 1.3-1.7), kept only as the benchmark and equality baseline."""
+    df = df.copy()
+    for col in ["temperature_2m", "surface_pressure"]:
+        mean = df[col].rolling(window=WINDOW_60D, min_periods=MIN_PERIODS_60D).mean()
+        std = df[col].rolling(window=WINDOW_60D, min_periods=MIN_PERIODS_60D).std()
+        df[f"{col}_z"] = (df[col] - mean) / (std + EPS)
+
+    df["wind_r"] = df["wind_speed_10m"].rolling(window=3, min_periods=1).mean()
+    med = df["wind_r"].rolling(window=WINDOW_60D, min_periods=MIN_PERIODS_60D).median()
+    q75 = df["wind_r"].rolling(window=WINDOW_60D, min_periods=MIN_PERIODS_60D).quantile(0.75)
+    q25 = df["wind_r"].rolling(window=WINDOW_60D, min_periods=MIN_PERIODS_60D).quantile(0.25)
+    df["wind_r"] = (df["wind_r"] - med) / ((q75 - q25) + EPS)
+
+    df["precip_log"] = np.log1p(df["precipitation"])
+    for window, min_periods in [(WINDOW_12H, MIN_PERIODS_12H), (WINDOW_24H, MIN_PERIODS_24H)]:
+        mean = df["precip_log"].rolling(window=window, min_periods=min_periods).mean()
+        std = df["precip_log"].rolling(window=window, min_periods=min_periods).std()
+        df[f"precip_z_{window}h"] = (df["precip_log"] - mean) / (std + EPS)
+    return df
+
+def synthetic_hourly_data(years: int = 8, seed: int = 42) -> pd.DataFrame:
+    """Weather-like hourly series (with a few gaps) for benchmarks."""
+    index = pd.date_range("2017-02-01", periods=years * 365 * 24, freq="h")
+    rng = np.random.default_rng(seed)
+    n = len(index)
+    hours = np.arange(n)
+    df = pd.DataFrame({
+        "temperature_2m": np.round(11 + 7 * np.sin(2 * np.pi * hours / 8766) + 4 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 2, n), 1),
+        "surface_pressure": np.round(1013 + np.cumsum(rng.normal(0, 0.3, n)) % 40 - 20, 1),
+        "precipitation": np.round(rng.gamma(0.4, 1.5, n) * (rng.random(n) < 0.15), 1),
+        "wind_speed_10m": np.round(np.abs(rng.normal(14, 6, n)), 1),
+    }, index=index)
+    df.iloc[rng.choice(n, size=n // 500, replace=False)] = np.nan
+    return df
+
+def benchmark_features(years: int = 8, repeats: int = 3) -> dict:
+    """
+    Time compute_if_features against the notebook code on `years` of hourly data.
+
+    - Returns mean seconds per run for each path and whether the IF features are bit-for-bit equal.
+    """
+    df = synthetic_hourly_data(years)
+    results = {}
+    outputs = {}
+    for name, build in [("notebook", _notebook_if_features), ("features", compute_if_features)]:
+        started = time.perf_counter()
+        for _ in range(repeats):
+            outputs[name] = build(df)
+        results[name] = (time.perf_counter() - started) / repeats
+
+    results["identical"] = all(
+        np.array_equal(outputs["notebook"][col].to_numpy(), outputs["features"][col].to_numpy(), equal_nan=True)
+        for col in IF_FEATURES + ["precip_log"]
+    )
+    return results
+
+if __name__ == "__main__":
+    # Benchmark: python -m scripts.features.engineering
+    timings = benchmark_features()
+    print(f"8 years hourly: notebook {timings['notebook'] * 1000:.0f} ms, features {timings['features'] * 1000:.0f} ms "
+          f"({timings['notebook'] / timings['features']:.1f}x), identical output: {timings['identical']}")
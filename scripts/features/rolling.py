@@ -0,0 +1,128 @@
+"""
+Rolling-window helpers for scripts/features.
+
+- rolling_median_iqr: rolling median, 25th and 75th percentiles in one pass over a single
+  sorted window (bisect insert/remove, O(log W) search per step) instead of three pandas
+  skip-list passes. The values equal pandas' .rolling().median()/.quantile() (checked by
+  benchmark_features in engineering.py).
+- trailing_mean / trailing_mean_step: mean of the last few non-NaN values, summed oldest to
+  newest, so a value does not depend on where the series starts (batch and streaming agree).
+- sorted_quantile / sorted_median: quantiles of a sorted window read through an index
+  function, with numpy's 'linear' arithmetic (used by FeatureState in state.py).
+
+Rolling means and standard deviations are left to pandas (compute_if_features calls
+.rolling().mean()/.std() directly).
+"""
+
+import math
+from bisect import bisect_left, insort
+import numpy as np
+
+NAN = float("nan")
+
+def _quantile_position(nobs: int, q: float):
+    """Index and interpolation fraction of quantile q among nobs sorted values (fraction None if exact)."""
+    position = q * (nobs - 1)
+    idx = int(position)
+    return idx, (None if idx == position else position - idx)
+
+def rolling_median_iqr(values, window: int, min_periods: int = None):
+    """
+    Rolling median, 25th and 75th percentiles of `values` in a single pass.
+
+    - Equivalent to pandas .rolling(window, min_periods).median() / .quantile(0.25) / .quantile(0.75).
+    - Returns three float64 arrays (median, q25, q75).
+    """
+    min_periods = max(window if min_periods is None else min_periods, 1)
+    values = np.asarray(values, dtype="float64").tolist()
+    median, q25, q75 = [], [], []
+
+    # Hot loop: one sorted window shared by all three statistics. Read positions only change with
+    # the number of non-NaN observations, so they are recomputed only when that count changes.
+    window_sorted = []
+    last_nobs = -1
+    for i, val in enumerate(values):
+        if val == val:
+            insort(window_sorted, val)
+        if i >= window:
+            old = values[i - window]
+            if old == old:
+                del window_sorted[bisect_left(window_sorted, old)]
+
+        nobs = len(window_sorted)
+        if nobs < min_periods:
+            median.append(NAN)
+            q25.append(NAN)
+            q75.append(NAN)
+            continue
+        if nobs != last_nobs:
+            last_nobs = nobs
+            mid, odd = nobs // 2, nobs % 2
+            i25, f25 = _quantile_position(nobs, 0.25)
+            i75, f75 = _quantile_position(nobs, 0.75)
+
+        median.append(window_sorted[mid] if odd else (window_sorted[mid] + window_sorted[mid - 1]) / 2)
+        vlow = window_sorted[i25]
+        q25.append(vlow if f25 is None else vlow + (window_sorted[i25 + 1] - vlow) * f25)
+        vlow = window_sorted[i75]
+        q75.append(vlow if f75 is None else vlow + (window_sorted[i75 + 1] - vlow) * f75)
+    return np.array(median), np.array(q25), np.array(q75)
+
+def trailing_mean(values, window: int) -> np.ndarray:
+    """
+    Mean of the last `window` non-NaN values at each position (fewer at the start of the series).
+
+    - Sums oldest to newest and divides by the count, so a value only depends on its own
+      `window` inputs and not on where the series starts (unlike pandas' running-sum kernel).
+    - NaN where all inputs are NaN.
+    """
+    values = np.asarray(values, dtype="float64")
+    total = np.zeros(len(values))
+    count = np.zeros(len(values))
+    for lag in range(window - 1, -1, -1):
+        shifted = np.full(len(values), np.nan)
+        shifted[lag:] = values[:len(values) - lag]
+        valid = ~np.isnan(shifted)
+        total = total + np.where(valid, shifted, 0.0)
+        count += valid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+def trailing_mean_step(values) -> float:
+    """Scalar trailing_mean for one position, given its (up to `window`) inputs oldest first."""
+    total, count = 0.0, 0
+    for val in values:
+        if val == val:
+            total += val
+            count += 1
+    return total / count if count else NAN
+
+def sorted_quantile(kth, nobs: int, q: float) -> float:
+    """
+    Quantile q of nobs sorted values read through kth(i), bit-identical to pandas Series.quantile.
+
+    - pandas passes q * 100 to numpy's percentile ('linear' method), so the index and
+      interpolation arithmetic follow numpy's (including its two-sided lerp).
+    """
+    if nobs == 0:
+        return NAN
+    q = (q * 100.0) / 100
+    virtual_index = (nobs - 1) * q
+    if virtual_index >= nobs - 1:
+        return kth(nobs - 1)
+    previous_index = math.floor(virtual_index)
+    gamma = virtual_index - previous_index
+    a, b = kth(previous_index), kth(previous_index + 1)
+    diff_b_a = b - a
+    if gamma >= 0.5:
+        return b - diff_b_a * (1 - gamma)
+    return a + diff_b_a * gamma
+
+def sorted_median(kth, nobs: int) -> float:
+    """Median of nobs sorted values read through kth(i), as pandas Series.median."""
+    if nobs == 0:
+        return NAN
+    mid = nobs // 2
+    if nobs % 2:
+        return kth(mid)
+    return (kth(mid - 1) + kth(mid)) / 2
@@ -0,0 +1,304 @@
+"""
+Streaming feature state for hourly inference.
+
+FeatureState holds the 1440h rolling buffers and order statistics behind compute_tnow_stats
+(IF feature statistics and dashboard bands). Each new hour is pushed in O(log W) (binary
+search into sorted windows) instead of re-sorting df_hist for every quantile and IQR, and
+stats() returns exactly the dict compute_tnow_stats would return for the same 1440 rows.
+
+- Quantiles and medians are read from the sorted windows in O(1), using numpy/pandas arithmetic.
+- Means and standard deviations are still O(W) per stats() call: they are read with pandas from
+  a contiguous view of the window buffer (no copy, one vectorised pass), because a running sum
+  cannot reproduce pandas' pairwise summation and would not match compute_tnow_stats bit for bit.
+- Hours already in the window can be revised (archive data replacing the forecast backfill);
+  only the affected entries of the sorted windows are updated.
+- The state is saved as JSON between runs, so an hourly job only needs the newest rows.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from bisect import bisect_left, bisect_right, insort
+from scripts.features.engineering import WINDOW_60D, WIND_SMOOTHING_HOURS, EPS
+from scripts.features.rolling import trailing_mean_step, sorted_quantile, sorted_median
+from utils.sites import site_dir
+
+FEATURE_STATE_SUBDIR = os.path.join("processed", "feature_state")
+FEATURE_STATE_FILE = "feature_state.json"
+INPUT_COLUMNS = ["temperature_2m", "surface_pressure", "wind_speed_10m", "precipitation"]
+ONE_HOUR = pd.Timedelta(hours=1)
+
+# Buffers kept per hour: the raw inputs plus the derived precip_log and wind_smoothed
+_BUFFERS = INPUT_COLUMNS + ["precip_log", "wind_smoothed"]
+
+def _same(a: float, b: float) -> bool:
+    return a == b or (a != a and b != b)
+
+def _remove_sorted(sorted_values: list, value: float):
+    if value == value:
+        del sorted_values[bisect_left(sorted_values, value)]
+
+def _insert_sorted(sorted_values: list, value: float):
+    if value == value:
+        insort(sorted_values, value)
+
+class FeatureState:
+    """Rolling window of the last `window` hourly observations with incrementally maintained statistics."""
+
+    def __init__(self, window: int = WINDOW_60D):
+        self.window = window
+        self.last_time = None
+        self.size = 0
+        self._head = 0
+        # Each buffer is twice the window so the window is always a contiguous slice; it is
+        # shifted back to the start once it reaches the end (amortised O(1) per push).
+        self._buffers = {name: np.full(2 * window, np.nan) for name in _BUFFERS}
+        self._temperature_sorted = []
+        self._wind_sorted = []
+        # Smoothed wind for window positions >= 2; positions 0 and 1 have truncated smoothing
+        # (computed from inside the window only) and are merged in when the statistics are read.
+        self._smoothed_sorted = []
+
+    # --- Window access ---
+
+    def _view(self, name: str) -> np.ndarray:
+        return self._buffers[name][self._head:self._head + self.size]
+
+    def _get(self, name: str, position: int) -> float:
+        return float(self._buffers[name][self._head + position])
+
+    def _set(self, name: str, position: int, value: float):
+        self._buffers[name][self._head + position] = value
+
+    @property
+    def first_time(self):
+        return None if self.last_time is None else self.last_time - (self.size - 1) * ONE_HOUR
+
+    def _smoothing_inputs(self, position: int) -> list:
+        start = max(0, position - WIND_SMOOTHING_HOURS + 1)
+        return [self._get("wind_speed_10m", p) for p in range(start, position + 1)]
+
+    # --- Updates ---
+
+    def _evict(self):
+        """Drop the oldest hour; the hour at position 2 moves to position 1 and leaves the interior."""
+        _remove_sorted(self._temperature_sorted, self._get("temperature_2m", 0))
+        _remove_sorted(self._wind_sorted, self._get("wind_speed_10m", 0))
+        if self.size > 2:
+            _remove_sorted(self._smoothed_sorted, self._get("wind_smoothed", 2))
+        self._head += 1
+        self.size -= 1
+
+    def push(self, time, temperature: float, pressure: float, wind: float, precipitation: float):
+        """Append the next hour (must directly follow last_time), dropping the oldest once the window is full."""
+        time = pd.Timestamp(time)
+        if self.last_time is not None and time != self.last_time + ONE_HOUR:
+            raise ValueError(f"FeatureState expects consecutive hours: got {time} after {self.last_time}")
+
+        if self.size == self.window:
+            self._evict()
+        if self._head + self.size == 2 * self.window:
+            for buffer in self._buffers.values():
+                buffer[:self.size] = buffer[self._head:self._head + self.size]
+            self._head = 0
+
+        position = self.size
+        self.size += 1
+        self.last_time = time
+        values = dict(zip(INPUT_COLUMNS, (float(temperature), float(pressure), float(wind), float(precipitation))))
+        for name, value in values.items():
+            self._set(name, position, value)
+        self._set("precip_log", position, np.log1p(np.array([values["precipitation"]]))[0])
+
+        _insert_sorted(self._temperature_sorted, values["temperature_2m"])
+        _insert_sorted(self._wind_sorted, values["wind_speed_10m"])
+        smoothed = trailing_mean_step(self._smoothing_inputs(position))
+        self._set("wind_smoothed", position, smoothed)
+        if position >= 2:
+            _insert_sorted(self._smoothed_sorted, smoothed)
+
+    def revise(self, time, temperature: float, pressure: float, wind: float, precipitation: float):
+        """Replace the values of an hour already in the window."""
+        position = int((pd.Timestamp(time) - self.first_time) / ONE_HOUR)
+        if not 0 <= position < self.size:
+            raise ValueError(f"{time} is outside the feature state window")
+
+        _remove_sorted(self._temperature_sorted, self._get("temperature_2m", position))
+        _insert_sorted(self._temperature_sorted, float(temperature))
+        _remove_sorted(self._wind_sorted, self._get("wind_speed_10m", position))
+        _insert_sorted(self._wind_sorted, float(wind))
+        self._set("temperature_2m", position, float(temperature))
+        self._set("surface_pressure", position, float(pressure))
+        self._set("wind_speed_10m", position, float(wind))
+        self._set("precipitation", position, float(precipitation))
+        self._set("precip_log", position, np.log1p(np.array([float(precipitation)]))[0])
+
+        # The wind change shifts the smoothed values of this hour and the next two
+        for p in range(position, min(position + WIND_SMOOTHING_HOURS, self.size)):
+            if p >= 2:
+                _remove_sorted(self._smoothed_sorted, self._get("wind_smoothed", p))
+            smoothed = trailing_mean_step(self._smoothing_inputs(p))
+            self._set("wind_smoothed", p, smoothed)
+            if p >= 2:
+                _insert_sorted(self._smoothed_sorted, smoothed)
+
+    def update(self, df: pd.DataFrame) -> dict:
+        """
+        Apply hourly rows (DatetimeIndex or 'date' column) to the state.
+
+        - Rows after last_time are pushed; they must continue the series without gaps.
+        - Rows inside the window whose values changed are revised; unchanged and older rows are skipped.
+        - Returns counts of pushed and revised hours.
+        """
+        times = pd.DatetimeIndex(df.index if isinstance(df.index, pd.DatetimeIndex) else df["date"])
+        rows = df[INPUT_COLUMNS].to_numpy(dtype="float64")
+        pushed = revised = 0
+        for time, row in zip(times, rows):
+            if self.last_time is None or time > self.last_time:
+                self.push(time, *row)
+                pushed += 1
+            elif time >= self.first_time:
+                position = int((time - self.first_time) / ONE_HOUR)
+                if not all(_same(self._get(name, position), value) for name, value in zip(INPUT_COLUMNS, row)):
+                    self.revise(time, *row)
+                    revised += 1
+        return {"pushed": pushed, "revised": revised}
+
+    @classmethod
+    def from_history(cls, df_hist: pd.DataFrame, window: int = WINDOW_60D) -> "FeatureState":
+        """Build the state from the last `window` rows of an hourly history (e.g. the 1440h rolling window)."""
+        state = cls(window)
+        state.update(df_hist.iloc[-window:])
+        return state
+
+    # --- Statistics ---
+
+    def _smoothed_kth(self):
+        """kth() over the smoothed wind of the whole window: the interior plus positions 0 and 1."""
+        edges = sorted(
+            value for value in (trailing_mean_step(self._smoothing_inputs(p)) for p in range(min(2, self.size)))
+            if value == value
+        )
+        interior = self._smoothed_sorted
+        # Merged position of each edge value among the interior values
+        edge_positions = [bisect_right(interior, value) + i for i, value in enumerate(edges)]
+
+        def kth(k: int) -> float:
+            before = 0
+            for value, position in zip(edges, edge_positions):
+                if position == k:
+                    return value
+                if position < k:
+                    before += 1
+            return interior[k - before]
+
+        return kth, len(interior) + len(edges)
+
+    def stats(self) -> dict:
+        """The statistics dict of compute_tnow_stats for the current window."""
+        temperature = pd.Series(self._view("temperature_2m"))
+        pressure = pd.Series(self._view("surface_pressure"))
+        precip_log = pd.Series(self._view("precip_log"))
+        temperature_kth, temperature_n = self._temperature_sorted.__getitem__, len(self._temperature_sorted)
+        wind_kth, wind_n = self._wind_sorted.__getitem__, len(self._wind_sorted)
+        smoothed_kth, smoothed_n = self._smoothed_kth()
+
+        wind_q1 = sorted_quantile(smoothed_kth, smoothed_n, 0.25)
+        wind_q3 = sorted_quantile(smoothed_kth, smoothed_n, 0.75)
+        stats = {
+            "temp_mean": temperature.mean(),
+            "temp_std": temperature.std() + EPS,
+            "press_mean": pressure.mean(),
+            "press_std": pressure.std() + EPS,
+            "wind_median": sorted_median(smoothed_kth, smoothed_n),
+            "wind_q1": wind_q1,
+            "wind_q3": wind_q3,
+            "wind_iqr": wind_q3 - wind_q1 + EPS,
+            "precip_log_mean_12h": precip_log.iloc[-12:].mean(),
+            "precip_log_std_12h": precip_log.iloc[-12:].std() + EPS,
+            "precip_log_mean_24h": precip_log.iloc[-24:].mean(),
+            "precip_log_std_24h": precip_log.iloc[-24:].std() + EPS,
+        }
+
+        temp_q1 = sorted_quantile(temperature_kth, temperature_n, 0.25)
+        temp_q3 = sorted_quantile(temperature_kth, temperature_n, 0.75)
+        raw_wind_q1 = sorted_quantile(wind_kth, wind_n, 0.25)
+        raw_wind_q3 = sorted_quantile(wind_kth, wind_n, 0.75)
+        stats.update({
+            "temp_q1": temp_q1,
+            "temp_upper": temp_q3 + 1.5 * (temp_q3 - temp_q1),
+            "wind_p10": sorted_quantile(wind_kth, wind_n, 0.10),
+            "wind_upper": raw_wind_q3 + 1.5 * (raw_wind_q3 - raw_wind_q1),
+            "press_lower": stats["press_mean"] - 2 * stats["press_std"],
+            "press_upper": stats["press_mean"] + 2 * stats["press_std"],
+        })
+        return stats
+
+    # --- Persistence ---
+
+    def to_dict(self) -> dict:
+        return {
+            "window": self.window,
+            "last_time": None if self.last_time is None else self.last_time.isoformat(),
+            "buffers": {name: self._view(name).tolist() for name in _BUFFERS},
+            "temperature_sorted": self._temperature_sorted,
+            "wind_sorted": self._wind_sorted,
+            "smoothed_sorted": self._smoothed_sorted,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FeatureState":
+        state = cls(data["window"])
+        state.last_time = None if data["last_time"] is None else pd.Timestamp(data["last_time"])
+        state.size = len(data["buffers"]["temperature_2m"])
+        for name in _BUFFERS:
+            state._buffers[name][:state.size] = data["buffers"][name]
+        state._temperature_sorted = list(data["temperature_sorted"])
+        state._wind_sorted = list(data["wind_sorted"])
+        state._smoothed_sorted = list(data["smoothed_sorted"])
+        return state
+
+    def save(self, path: str):
+        """Write the state atomically as JSON (floats round-trip exactly)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FeatureState":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+def feature_state_path(site_id=None) -> str:
+    return os.path.join(site_dir(site_id, FEATURE_STATE_SUBDIR), FEATURE_STATE_FILE)
+
+def update_feature_state(df: pd.DataFrame, site_id=None, path: str = None) -> FeatureState:
+    """
+    Load a site's saved feature state, apply new or revised hourly rows and save it again.
+
+    - `df` only needs the hours since the previous run (plus any revised hours).
+    - Without a saved state, or if `df` does not continue it (a gap after the saved hours), the
+      state is rebuilt from `df`, which must then hold the full window; otherwise ValueError is
+      raised and the saved state is left untouched.
+    """
+    path = path or feature_state_path(site_id)
+    if os.path.exists(path):
+        state = FeatureState.load(path)
+        try:
+            state.update(df)
+            state.save(path)
+            return state
+        except ValueError as e:
+            reason = str(e)
+    else:
+        reason = f"no saved feature state at {path}"
+
+    if len(df) < WINDOW_60D:
+        raise ValueError(f"Cannot rebuild the feature state from {len(df)} rows ({reason}); "
+                         f"pass the full {WINDOW_60D}h history.")
+    state = FeatureState.from_history(df)
+    state.save(path)
+    return state
@@ -0,0 +1,164 @@
+"""
+Memory-mapped, lazily scaled LSTM-AE training dataset.
+
+The training notebook stacks every retained 720-step window into X_train_lstm and saves it
+with np.save, so each hour is stored up to 720 times. WindowedSequenceDataset instead keeps:
+
+- base.npy: the input series once, as a float32 (n_rows, n_features) array opened with mmap
+- starts.npy: the start offsets of the valid windows (after the anomaly filter)
+- times.npy: the timestamps of the base rows
+- meta.json: sequence length, columns, scaled feature indices and window counts
+
+Batches are sliced from the memory-mapped base and robust-scaled on demand (as in
+scripts/modelling/sequences.py), so memory and disk scale with the series length rather
+than series length x 720. The dataset can be used directly (len/indexing, like a Keras
+Sequence) or wrapped with as_keras_sequence() / as_tf_dataset(); TensorFlow is only
+imported by those wrappers.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scripts.features.engineering import LSTM_INPUT_COLS
+from scripts.modelling.sequences import (
+    SEQUENCE_LENGTH, FEATURES_TO_SCALE, robust_scale_windows, select_window_starts
+)
+
+DATASET_BATCH_SIZE = 64
+BASE_FILE = "base.npy"
+STARTS_FILE = "starts.npy"
+TIMES_FILE = "times.npy"
+META_FILE = "meta.json"
+
+class WindowedSequenceDataset:
+    """Scaled (batch_size, sequence_length, n_features) batches generated from a memory-mapped series."""
+
+    def __init__(self, directory: str, batch_size: int = DATASET_BATCH_SIZE, shuffle: bool = True, seed: int = None):
+        with open(os.path.join(directory, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.directory = directory
+        self.sequence_length = self.meta["sequence_length"]
+        self.feature_indices = self.meta["feature_indices"]
+        self.base = np.load(os.path.join(directory, BASE_FILE), mmap_mode="r")
+        self.starts = np.load(os.path.join(directory, STARTS_FILE))
+        self.times = np.load(os.path.join(directory, TIMES_FILE))
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self._rng = np.random.default_rng(seed)
+        # (n_windows, sequence_length, n_features) view over the mapped file; nothing is read yet
+        self._windows = sliding_window_view(self.base, self.sequence_length, axis=0).transpose(0, 2, 1)
+        self._order = np.arange(len(self.starts))
+        self.on_epoch_end()
+
+    @classmethod
+    def build(
+        cls,
+        df: pd.DataFrame,
+        directory: str,
+        sequence_length: int = SEQUENCE_LENGTH,
+        sequence_stride: int = 1,
+        max_allowed_anomalies: int = None,
+        lstm_input_cols_all=None,
+        feature_indices=None,
+        **kwargs,
+    ) -> "WindowedSequenceDataset":
+        """
+        Writes the base array and window index for `df` to `directory` and opens the dataset.
+
+        - Windows are selected as in construct_lstm_sequences (select_window_starts).
+        - Remaining keyword arguments (batch_size, shuffle, seed) are passed to the constructor.
+        """
+        lstm_input_cols_all = LSTM_INPUT_COLS if lstm_input_cols_all is None else lstm_input_cols_all
+        if feature_indices is None:
+            feature_indices = [lstm_input_cols_all.index(f) for f in FEATURES_TO_SCALE]
+
+        starts, debug_counts = select_window_starts(df, sequence_length, sequence_stride, max_allowed_anomalies)
+
+        os.makedirs(directory, exist_ok=True)
+        base = np.lib.format.open_memmap(
+            os.path.join(directory, BASE_FILE), mode="w+", dtype=np.float32, shape=(len(df), len(lstm_input_cols_all))
+        )
+        base[:] = df[lstm_input_cols_all].to_numpy(dtype=np.float32)
+        base.flush()
+        del base
+        np.save(os.path.join(directory, STARTS_FILE), starts.astype(np.int64))
+        np.save(os.path.join(directory, TIMES_FILE), df.index.values)
+        with open(os.path.join(directory, META_FILE), "w") as f:
+            json.dump({
+                "sequence_length": sequence_length,
+                "sequence_stride": sequence_stride,
+                "columns": list(lstm_input_cols_all),
+                "feature_indices": list(feature_indices),
+                "debug_counts": debug_counts,
+            }, f, indent=2)
+        return cls(directory, **kwargs)
+
+    def __len__(self) -> int:
+        return int(np.ceil(len(self.starts) / self.batch_size))
+
+    def window_batch(self, window_ids) -> np.ndarray:
+        """Scaled float32 windows for positions `window_ids` in the window index."""
+        starts = self.starts[np.sort(np.asarray(window_ids))]  # sorted reads are sequential in the file
+        # Scaling runs in float64 like the notebooks; the batch is handed to Keras as float32
+        windows = self._windows[starts].astype(np.float64)
+        return robust_scale_windows(windows, self.feature_indices, out=windows).astype(np.float32)
+
+    def __getitem__(self, index: int):
+        """Batch `index` of the current epoch as (inputs, targets); targets are the inputs (autoencoder)."""
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        batch = self.window_batch(self._order[index * self.batch_size:(index + 1) * self.batch_size])
+        return batch, batch
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self._rng.shuffle(self._order)
+
+    @property
+    def sequence_starts(self) -> np.ndarray:
+        """Start timestamps of the valid windows (as sequence_starts from construct_lstm_sequences)."""
+        return self.times[self.starts]
+
+    def used_mask(self) -> np.ndarray:
+        """Boolean mask of base rows covered by at least one valid window (used_in_lstm_training)."""
+        coverage = np.zeros(len(self.base) + 1, dtype=np.int64)
+        np.add.at(coverage, self.starts, 1)
+        np.add.at(coverage, self.starts + self.sequence_length, -1)
+        return np.cumsum(coverage[:-1]) > 0
+
+    def as_keras_sequence(self):
+        """Wraps the dataset in a keras.utils.Sequence for model.fit."""
+        from tensorflow import keras
+
+        dataset = self
+
+        class _KerasWindowedSequence(keras.utils.Sequence):
+            def __init__(self):
+                super().__init__()
+
+            def __len__(self):
+                return len(dataset)
+
+            def __getitem__(self, index):
+                return dataset[index]
+
+            def on_epoch_end(self):
+                dataset.on_epoch_end()
+
+        return _KerasWindowedSequence()
+
+    def as_tf_dataset(self, prefetch: int = 2):
+        """tf.data pipeline over one epoch of batches, prefetching `prefetch` batches in the background."""
+        import tensorflow as tf
+
+        shape = (None, self.sequence_length, self.base.shape[1])
+
+        def generate():
+            for index in range(len(self)):
+                yield self[index]
+            self.on_epoch_end()
+
+        signature = (tf.TensorSpec(shape, tf.float32), tf.TensorSpec(shape, tf.float32))
+        return tf.data.Dataset.from_generator(generate, output_signature=signature).prefetch(prefetch)
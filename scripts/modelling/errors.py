@@ -0,0 +1,125 @@
+"""
+Per-hour aggregation of LSTM-AE reconstruction errors across overlapping windows.
+
+Both notebooks expand a (n_seq, 720) timestamp matrix, flatten it with the per-step errors
+into a DataFrame of up to n_seq x 720 rows and run groupby('date').mean(). OverlapErrorAggregator
+instead accumulates the error sum and window count of every hour into two arrays indexed by
+row offset in the series, chunk by chunk as predictions come out of the model. Memory is
+O(series length) and no intermediate DataFrame is built.
+
+The mean per hour equals the groupby result up to float rounding (sums are accumulated in
+float64). Run `python -m scripts.modelling.errors` to benchmark against the notebook code.
+
+Given per-feature errors (n_windows, sequence_length, n_features), the aggregator also keeps
+per-hour, per-feature sums (feature_mean, the error attribution REA plots), and the per-step
+error is their mean across features, exactly as np.mean(np.abs(X - X_recon), axis=2).
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from scripts.modelling.sequences import SEQUENCE_LENGTH
+
+class OverlapErrorAggregator:
+    """Running sum and count of per-step window errors for each row of a series."""
+
+    def __init__(self, n_rows: int, sequence_length: int = SEQUENCE_LENGTH):
+        self.sequence_length = sequence_length
+        self.sums = np.zeros(n_rows, dtype=np.float64)
+        self.counts = np.zeros(n_rows, dtype=np.int64)
+        self.feature_sums = None  # (n_rows, n_features), allocated on the first per-feature chunk
+
+    def add(self, starts, errors):
+        """
+        Adds a chunk of window errors.
+
+        - `starts`: row offset of each window's first step; `errors`: (n_windows, sequence_length) per-step
+          errors, or (n_windows, sequence_length, n_features) per-feature absolute errors.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        errors = np.asarray(errors)
+        if not len(starts):
+            return
+        if errors.shape[:2] != (len(starts), self.sequence_length) or errors.ndim not in (2, 3):
+            raise ValueError(f"Expected errors of shape {(len(starts), self.sequence_length)} (+ features), got {errors.shape}")
+
+        # Only the span of rows touched by this chunk is updated
+        low, high = int(starts.min()), int(starts.max()) + self.sequence_length
+        offsets = ((starts - low)[:, None] + np.arange(self.sequence_length)).ravel()
+        if errors.ndim == 3:
+            if self.feature_sums is None:
+                self.feature_sums = np.zeros((len(self.sums), errors.shape[2]), dtype=np.float64)
+            for feature in range(errors.shape[2]):
+                self.feature_sums[low:high, feature] += np.bincount(offsets, weights=errors[:, :, feature].ravel(),
+                                                                    minlength=high - low)
+            errors = np.mean(errors, axis=2)
+        self.sums[low:high] += np.bincount(offsets, weights=errors.ravel(), minlength=high - low)
+        self.counts[low:high] += np.bincount(offsets, minlength=high - low)
+
+    def mean(self) -> np.ndarray:
+        """Mean error per row; NaN for rows not covered by any window."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.counts > 0, self.sums / self.counts, np.nan)
+
+    def feature_mean(self) -> np.ndarray:
+        """(n_rows, n_features) mean absolute error per row and feature; NaN for uncovered rows."""
+        if self.feature_sums is None:
+            raise ValueError("No per-feature errors were added")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.counts[:, None] > 0, self.feature_sums / self.counts[:, None], np.nan)
+
+    def to_frame(self, times, column: str = "lstm_error", feature_names: list = None) -> pd.DataFrame:
+        """
+        Covered rows as a ('date', column) DataFrame, like groupby('date').mean().reset_index().
+
+        - With feature_names (one per error feature), adds a '<column>_<feature>' column per feature.
+        """
+        covered = self.counts > 0
+        frame = pd.DataFrame({
+            "date": pd.DatetimeIndex(times)[covered],
+            column: self.sums[covered] / self.counts[covered],
+        })
+        if feature_names is not None:
+            feature_errors = self.feature_mean()[covered]
+            for i, name in enumerate(feature_names):
+                frame[f"{column}_{name}"] = feature_errors[:, i]
+        return frame
+
+def _notebook_aggregate(times, starts, errors, sequence_length: int) -> pd.DataFrame:
+    """Notebook steps 10.1 / 3.2 (timestamp matrix, flatten, groupby), kept only as the benchmark baseline."""
+    start_times = pd.DatetimeIndex(times)[starts].to_numpy()
+    timestamps_array = start_times[:, None] + np.arange(sequence_length).astype("timedelta64[h]")
+    df = pd.DataFrame({"date": timestamps_array.ravel(), "lstm_error": errors.ravel()})
+    return df.groupby("date")["lstm_error"].mean().reset_index()
+
+def benchmark_aggregation(n_rows: int = 20000, sequence_length: int = SEQUENCE_LENGTH, chunk_size: int = 1024) -> dict:
+    """
+    Time OverlapErrorAggregator (fed in chunks) against the notebook groupby on random stride-1 errors.
+
+    - Returns seconds for each path and the largest absolute difference between the two results.
+    """
+    times = pd.date_range("2017-01-01", periods=n_rows, freq="h")
+    starts = np.arange(n_rows - sequence_length + 1)
+    errors = np.random.default_rng(0).gamma(2.0, 0.2, (len(starts), sequence_length)).astype(np.float32)
+
+    started = time.perf_counter()
+    aggregator = OverlapErrorAggregator(n_rows, sequence_length)
+    for begin in range(0, len(starts), chunk_size):
+        aggregator.add(starts[begin:begin + chunk_size], errors[begin:begin + chunk_size])
+    result = aggregator.to_frame(times)
+    results = {"windows": len(starts), "aggregator": time.perf_counter() - started}
+
+    started = time.perf_counter()
+    expected = _notebook_aggregate(times, starts, errors, sequence_length)
+    results["notebook"] = time.perf_counter() - started
+
+    results["max_abs_diff"] = float(np.abs(result["lstm_error"].to_numpy() - expected["lstm_error"].to_numpy()).max())
+    results["same_dates"] = bool((result["date"].to_numpy() == expected["date"].to_numpy()).all())
+    return results
+
+if __name__ == "__main__":
+    # Benchmark: python -m scripts.modelling.errors
+    timings = benchmark_aggregation()
+    print(f"{timings['windows']} windows: notebook {timings['notebook']:.2f} s, aggregator {timings['aggregator']:.2f} s "
+          f"({timings['notebook'] / timings['aggregator']:.1f}x), same dates: {timings['same_dates']}, "
+          f"max abs diff {timings['max_abs_diff']:.1e}")
@@ -0,0 +1,255 @@
+"""
+Flattened, array-based Isolation Forest.
+
+sklearn's decision_function walks each of the 100 estimators through the generic tree API,
+and the XAI notebook walks the same trees again node by node in Python (tree_path_features).
+FlatForest packs every estimator into one set of contiguous node arrays (global node ids,
+split features mapped to input columns) and traverses all trees for a batch of samples at
+once. Leaves point to themselves, so each step advances every (sample, tree) pair with a few
+np.take gathers and the Python loop runs max_depth times (8 for max_samples=256) rather than
+samples x trees x depth. Per-node path depths and per-feature split counts are precomputed,
+so path lengths and split counts follow from the leaves reached.
+
+One traversal (FlatForest.traverse) returns everything scoring and explanation need:
+
+- leaves: leaf reached in every tree, as tree.apply
+- path_lengths: splits on every path (decision_path nnz - 1)
+- split_counts: per sample and feature, how many splits on that feature its paths crossed
+- score_samples / decision_function: identical to sklearn (same float32 input cast and the
+  same per-tree accumulation order)
+
+Run `python -m scripts.modelling.forest` to compare with sklearn on synthetic features.
+"""
+
+import time
+import numpy as np
+
+class ForestTraversal(dict):
+    """Results of one FlatForest.traverse call (a dict with attribute access)."""
+    __getattr__ = dict.__getitem__
+
+class FlatForest:
+    """All Isolation Forest estimators packed into contiguous node arrays."""
+
+    ARRAYS = ("children_left", "children_right", "feature", "threshold", "missing_go_to_left",
+              "leaf_terms", "tree_offsets")
+
+    def __init__(self, arrays: dict, denominator: float, offset: float, n_features: int):
+        for name in self.ARRAYS:
+            setattr(self, name, np.asarray(arrays[name]))
+        self.denominator = float(denominator)
+        self.offset_ = float(offset)
+        self.n_features_in_ = int(n_features)
+        self.n_estimators = len(self.tree_offsets) - 1
+        self.is_leaf = self.children_left == -1
+
+        # Traversal tables: leaves point to themselves, so every (sample, tree) pair can take the
+        # same number of steps; children[2 * node + go_right] is the next node.
+        nodes = np.arange(len(self.is_leaf))
+        self._children = np.stack([np.where(self.is_leaf, nodes, self.children_left),
+                                   np.where(self.is_leaf, nodes, self.children_right)], axis=1).ravel().astype(np.intp)
+        self._feature = np.where(self.is_leaf, 0, self.feature).astype(np.intp)
+        self._threshold = np.where(self.is_leaf, np.inf, self.threshold)
+        self._roots = self.tree_offsets[:-1].astype(np.intp)
+        self.node_depths, self._path_split_counts = self._node_paths()
+        self._steps = int(self.node_depths.max()) - 1 if len(nodes) else 0
+
+    def _node_paths(self):
+        """
+        Depth (root = 1) of every node, and (n_nodes, n_features) splits on each feature between
+        the root and the node (i.e. decision_path @ node_feature_indicator for a sample ending
+        there); also fills the parent of every node. Parents precede their children within a tree.
+        """
+        depths = np.ones(len(self.is_leaf), dtype=np.int64)
+        counts = np.zeros((len(self.is_leaf), self.n_features_in_), dtype=np.int32)
+        self._parent = np.full(len(self.is_leaf), -1, dtype=np.intp)
+        for node in np.flatnonzero(~self.is_leaf):
+            for child in (self.children_left[node], self.children_right[node]):
+                self._parent[child] = node
+                depths[child] = depths[node] + 1
+                counts[child] = counts[node]
+                counts[child, self.feature[node]] += 1
+        return depths, counts
+
+    @classmethod
+    def from_model(cls, model) -> "FlatForest":
+        """
+        Flattens a fitted sklearn IsolationForest.
+
+        - leaf_terms holds, per node, what sklearn adds to a sample's depth when it ends there:
+          path length (root = 1) + average path length of the node's samples - 1.
+        """
+        from sklearn.ensemble._iforest import _average_path_length
+
+        parts = {name: [] for name in cls.ARRAYS if name != "tree_offsets"}
+        offsets = [0]
+        for tree, features in zip(model.estimators_, model.estimators_features_):
+            nodes = tree.tree_
+            left, right = nodes.children_left, nodes.children_right
+            base = offsets[-1]
+            parts["children_left"].append(np.where(left == -1, -1, left + base))
+            parts["children_right"].append(np.where(right == -1, -1, right + base))
+            parts["feature"].append(np.where(left == -1, 0, np.asarray(features)[np.maximum(nodes.feature, 0)]))
+            parts["threshold"].append(nodes.threshold)
+            missing = getattr(nodes, "missing_go_to_left", None)
+            parts["missing_go_to_left"].append(np.zeros(len(left), bool) if missing is None else missing.astype(bool))
+            parts["leaf_terms"].append(_node_depths(left, right) + _average_path_length(nodes.n_node_samples) - 1.0)
+            offsets.append(base + len(left))
+
+        arrays = {name: np.concatenate(values) for name, values in parts.items()}
+        for name in ("children_left", "children_right", "feature"):
+            arrays[name] = arrays[name].astype(np.int64)
+        arrays["tree_offsets"] = np.array(offsets, dtype=np.int64)
+        denominator = len(model.estimators_) * _average_path_length([model._max_samples])[0]
+        return cls(arrays, denominator, model.offset_, model.n_features_in_)
+
+    def save(self, path: str):
+        np.savez(path, denominator=self.denominator, offset=self.offset_, n_features=self.n_features_in_,
+                 **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path: str) -> "FlatForest":
+        with np.load(path) as data:
+            return cls({name: data[name] for name in cls.ARRAYS}, data["denominator"], data["offset"], data["n_features"])
+
+    def traverse(self, X, split_counts: bool = True, chunk_size: int = 256) -> ForestTraversal:
+        """
+        Runs every sample through every tree in one vectorised pass.
+
+        - X is cast to float32 like sklearn; NaNs follow the trees' missing-value direction.
+        - Samples are processed `chunk_size` at a time so the working arrays stay in cache.
+        - Returns leaves (n, n_estimators), path_lengths (n, n_estimators), score_samples,
+          decision_function and, if requested, split_counts (n, n_features).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32).reshape(len(X), -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features_in_}")
+        has_missing = bool(np.isnan(X).any())
+        leaves = np.empty((len(X), self.n_estimators), dtype=np.intp)
+
+        for begin in range(0, len(X), chunk_size):
+            values = X[begin:begin + chunk_size].ravel()
+            n_chunk = len(values) // max(self.n_features_in_, 1)
+            # Flat (sample, tree) pairs, sample-major; `rows` is each pair's offset into `values`
+            rows = np.repeat(np.arange(n_chunk, dtype=np.intp) * self.n_features_in_, self.n_estimators)
+            node = np.tile(self._roots, n_chunk)
+            for _ in range(self._steps):
+                value = np.take(values, rows + np.take(self._feature, node))
+                threshold = np.take(self._threshold, node)
+                if has_missing:
+                    go_right = ~((value <= threshold) | (np.isnan(value) & np.take(self.missing_go_to_left, node)))
+                else:
+                    go_right = value > threshold
+                node = np.take(self._children, 2 * node + go_right)
+            leaves[begin:begin + chunk_size] = node.reshape(n_chunk, self.n_estimators)
+
+        result = ForestTraversal(leaves=leaves, path_lengths=self.node_depths[leaves] - 1)
+        result["score_samples"] = self._score_from_leaves(leaves)
+        result["decision_function"] = result["score_samples"] - self.offset_
+        if split_counts:
+            result["split_counts"] = self._path_split_counts[leaves].sum(axis=1, dtype=np.int64)
+        return result
+
+    def _score_from_leaves(self, leaves: np.ndarray) -> np.ndarray:
+        # Accumulate tree by tree (cumsum is sequential) so the sum matches sklearn bit for bit
+        depths = np.cumsum(self.leaf_terms[leaves], axis=1)[:, -1] if leaves.shape[1] else np.zeros(len(leaves))
+        scores = 2 ** (-np.divide(depths, self.denominator, out=np.ones_like(depths), where=self.denominator != 0))
+        return -scores
+
+    def decision_path(self, X):
+        """
+        Nodes visited by every sample in every tree, like RandomForest.decision_path.
+
+        - Returns (indicator, tree_offsets): a sparse (n, n_nodes) CSR matrix with a 1 for each node
+          on a sample's paths, and the column where each tree's nodes start.
+        """
+        from scipy.sparse import csr_matrix
+
+        leaves = self.apply(X)
+        rows, cols = [], []
+        sample = np.repeat(np.arange(len(leaves)), self.n_estimators)
+        node = leaves.ravel()
+        while len(node):  # walk every path up to its root
+            rows.append(sample)
+            cols.append(node)
+            keep = self._parent[node] != -1
+            sample, node = sample[keep], self._parent[node[keep]]
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        indicator = csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(len(leaves), len(self.is_leaf)))
+        indicator.sort_indices()
+        return indicator, self.tree_offsets.copy()
+
+    def node_feature_indicator(self):
+        """Sparse (n_nodes, n_features) matrix with a 1 at each split node's feature; leaves are empty rows."""
+        from scipy.sparse import csr_matrix
+
+        internal = np.flatnonzero(~self.is_leaf)
+        return csr_matrix((np.ones(len(internal), dtype=np.int64), (internal, self.feature[internal])),
+                          shape=(len(self.is_leaf), self.n_features_in_))
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf reached in every tree (global node ids), shape (n, n_estimators)."""
+        return self.traverse(X, split_counts=False)["leaves"]
+
+    def score_samples(self, X) -> np.ndarray:
+        """Opposite of the anomaly score, as IsolationForest.score_samples."""
+        return self.traverse(X, split_counts=False)["score_samples"]
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X) -> np.ndarray:
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+def _node_depths(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Depth of every node of one tree, counting the root as 1 (nodes on the decision path)."""
+    depths = np.zeros(len(left), dtype=np.int64)
+    depths[0] = 1
+    for node in range(len(left)):  # children always have larger ids than their parent
+        if left[node] != -1:
+            depths[left[node]] = depths[right[node]] = depths[node] + 1
+    return depths
+
+def benchmark_forest(n_rows: int = 5000, repeats: int = 3) -> dict:
+    """
+    Times FlatForest.traverse against sklearn decision_function plus per-tree decision_path.
+
+    - Fits an IsolationForest on synthetic IF features; returns seconds per path and parity checks.
+    """
+    from sklearn.ensemble import IsolationForest
+    from scripts.features.engineering import synthetic_hourly_data, compute_if_features, IF_FEATURES
+
+    X = compute_if_features(synthetic_hourly_data(2))[IF_FEATURES].dropna().to_numpy()
+    model = IsolationForest(n_estimators=100, random_state=42).fit(X)
+    X = X[:n_rows]
+    forest = FlatForest.from_model(model)
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        expected = model.decision_function(X)
+        expected_lengths = np.stack([tree.decision_path(X.astype(np.float32)).sum(axis=1).A1 - 1
+                                     for tree in model.estimators_], axis=1)
+    sklearn_seconds = (time.perf_counter() - started) / repeats
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = forest.traverse(X)
+    flat_seconds = (time.perf_counter() - started) / repeats
+
+    return {
+        "rows": len(X),
+        "sklearn": sklearn_seconds,
+        "flat": flat_seconds,
+        "identical_scores": bool(np.array_equal(expected, result["decision_function"])),
+        "identical_path_lengths": bool(np.array_equal(expected_lengths, result["path_lengths"])),
+        "split_counts_match_paths": bool(np.array_equal(result["split_counts"].sum(axis=1),
+                                                        result["path_lengths"].sum(axis=1))),
+    }
+
+if __name__ == "__main__":
+    # Benchmark: python -m scripts.modelling.forest
+    timings = benchmark_forest()
+    print(f"{timings['rows']} rows: sklearn {timings['sklearn'] * 1000:.0f} ms, flat {timings['flat'] * 1000:.0f} ms "
+          f"({timings['sklearn'] / timings['flat']:.1f}x); identical scores {timings['identical_scores']}, "
+          f"identical path lengths {timings['identical_path_lengths']}, "
+          f"split counts consistent {timings['split_counts_match_paths']}")
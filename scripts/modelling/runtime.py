@@ -0,0 +1,304 @@
+"""
+Lightweight CPU inference runtimes for the Isolation Forest and the LSTM-AE.
+
+Hourly inference loads if_model.joblib with joblib and lstm_ae_best.h5 with Keras; importing
+TensorFlow alone takes seconds and Keras predict adds per-call overhead. This module exports
+both models to lighter formats and serves them through one interface:
+
+- Isolation Forest: export_isolation_forest writes the fitted trees as plain node arrays
+  (.npz); FlatForest (scripts/modelling/forest.py) scores them with numpy only, with the
+  same decision_function, score_samples and predict results as sklearn.
+- LSTM-AE: export_lstm_ae converts the Keras model to TFLite or ONNX; the runtimes use
+  tflite_runtime / ai_edge_litert (falling back to tf.lite) or onnxruntime.
+
+The runtime is picked from the file extension (register_lstm_backend adds more). With
+LSTM_RUNTIME / IF_RUNTIME set to 'auto', load_lstm_ae and load_isolation_forest prefer an
+exported model under outputs/modelling/models/runtime and fall back to the originals.
+
+Every export records the content hash (file_fingerprint) of the model file it was made from
+in a sidecar '<export>.json'. An export is only used while that hash matches the current
+if_model.joblib / lstm_ae_best.h5, so a retrained model is never shadowed by an old export:
+the Isolation Forest is re-exported on the spot, the LSTM-AE falls back to Keras ('auto') or
+raises (an explicitly requested runtime) until export_lstm_ae is run again.
+
+Run `python -m scripts.modelling.runtime` to export, check parity against the originals and
+benchmark startup and latency of every available runtime.
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+import numpy as np
+from config.original_config import LSTM_RUNTIME, IF_RUNTIME
+from scripts.modelling.forest import FlatForest
+from scripts.modelling.window_cache import file_fingerprint
+from utils.find_root import find_project_root
+from utils.logger import log_event
+
+PROJECT_ROOT = find_project_root()
+MODELS_DIR = os.path.join(PROJECT_ROOT, "outputs", "modelling", "models")
+IF_MODEL_PATH = os.path.join(MODELS_DIR, "if_model.joblib")
+LSTM_MODEL_PATH = os.path.join(MODELS_DIR, "lstm_ae_best.h5")
+RUNTIME_DIR = os.path.join(MODELS_DIR, "runtime")
+IF_ARRAYS_PATH = os.path.join(RUNTIME_DIR, "if_model.npz")
+LSTM_EXPORT_PATHS = {
+    "tflite": os.path.join(RUNTIME_DIR, "lstm_ae.tflite"),
+    "onnx": os.path.join(RUNTIME_DIR, "lstm_ae.onnx"),
+}
+
+# ===== Export provenance =====
+
+def _source_path(path: str) -> str:
+    return f"{path}.json"
+
+def _record_source(path: str, model_path: str):
+    """Writes the sidecar recording which model file (by content hash) an export was made from."""
+    with open(_source_path(path), "w") as f:
+        json.dump({"source": os.path.basename(model_path), "source_fingerprint": file_fingerprint(model_path)}, f)
+
+def export_is_current(path: str, model_path: str) -> bool:
+    """
+    True if the export at `path` exists and was made from the current contents of `model_path`.
+
+    - Without the source model there is nothing to compare against, so an existing export counts as current.
+    - Exports without a sidecar (made before provenance was recorded) count as stale.
+    """
+    if not os.path.exists(path):
+        return False
+    if not os.path.exists(model_path):
+        return True
+    try:
+        with open(_source_path(path)) as f:
+            recorded = json.load(f)["source_fingerprint"]
+    except (OSError, ValueError, KeyError):
+        return False
+    return recorded == file_fingerprint(model_path)
+
+# ===== Isolation Forest =====
+
+def export_isolation_forest(model_path: str = IF_MODEL_PATH, path: str = IF_ARRAYS_PATH, model=None) -> str:
+    """
+    Writes the fitted IsolationForest of `model_path` as the contiguous node arrays of a FlatForest (.npz).
+
+    - `model` skips loading when the caller already holds the model of `model_path`.
+    """
+    if model is None:
+        import joblib
+
+        model = joblib.load(model_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    FlatForest.from_model(model).save(path)
+    _record_source(path, model_path)
+    return path
+
+def load_isolation_forest(runtime: str = IF_RUNTIME, model_path: str = IF_MODEL_PATH, path: str = IF_ARRAYS_PATH):
+    """
+    Isolation Forest for scoring: 'arrays' (exported), 'sklearn' (joblib) or 'auto' (arrays if exported).
+
+    - An export that does not match the current model file is re-exported before use.
+    """
+    if runtime == "arrays" or (runtime == "auto" and os.path.exists(path)):
+        if not export_is_current(path, model_path):
+            log_event(f"{os.path.basename(path)} does not match {os.path.basename(model_path)}; re-exporting.",
+                      module="model_runtime")
+            export_isolation_forest(model_path, path)
+        return FlatForest.load(path)
+    import joblib
+
+    return joblib.load(model_path)
+
+# ===== LSTM-AE =====
+
+class _KerasRuntime:
+    def __init__(self, path: str):
+        from tensorflow.keras.models import load_model
+
+        self.model = load_model(path, compile=False)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict_on_batch(batch))
+
+class _TFLiteRuntime:
+    def __init__(self, path: str):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                from tensorflow.lite import Interpreter
+        self.interpreter = Interpreter(model_path=path, num_threads=os.cpu_count())
+        self.input_index = self.interpreter.get_input_details()[0]["index"]
+        self.output_index = self.interpreter.get_output_details()[0]["index"]
+        self.shape = None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if batch.shape != self.shape:
+            self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+            self.interpreter.allocate_tensors()
+            self.shape = batch.shape
+        self.interpreter.set_tensor(self.input_index, batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index).copy()
+
+class _OnnxRuntime:
+    def __init__(self, path: str):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+_LSTM_BACKENDS = {".h5": _KerasRuntime, ".keras": _KerasRuntime, ".tflite": _TFLiteRuntime, ".onnx": _OnnxRuntime}
+
+def register_lstm_backend(extension: str, loader):
+    """Registers a runtime class/factory taking a model path and exposing predict(batch)."""
+    _LSTM_BACKENDS[extension] = loader
+
+def load_lstm_runtime(path: str):
+    """LSTM-AE runtime for a model file, chosen by extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in _LSTM_BACKENDS:
+        raise ValueError(f"No LSTM-AE runtime for '{extension}'. Available: {sorted(_LSTM_BACKENDS)}")
+    return _LSTM_BACKENDS[extension](path)
+
+def load_lstm_ae(runtime: str = LSTM_RUNTIME, model_path: str = LSTM_MODEL_PATH, export_paths: dict = LSTM_EXPORT_PATHS):
+    """
+    LSTM-AE for scoring: 'keras', 'tflite', 'onnx' or 'auto' (first current exported model found, else Keras).
+
+    - Exports that do not match the current Keras model are skipped by 'auto' and rejected
+      (ValueError) when requested explicitly; run export_lstm_ae again after retraining.
+    """
+    if runtime in export_paths:
+        path = export_paths[runtime]
+        if os.path.exists(path) and not export_is_current(path, model_path):
+            raise ValueError(f"{path} was exported from a different {os.path.basename(model_path)}; "
+                             f"re-export it with export_lstm_ae({runtime!r}).")
+        return load_lstm_runtime(path)
+    if runtime == "auto":
+        for path in export_paths.values():
+            if export_is_current(path, model_path):
+                return load_lstm_runtime(path)
+            if os.path.exists(path):
+                log_event(f"WARNING: ignoring {os.path.basename(path)}, exported from a different "
+                          f"{os.path.basename(model_path)}.", module="model_runtime")
+    return load_lstm_runtime(model_path)
+
+def export_lstm_ae(fmt: str = "tflite", model_path: str = LSTM_MODEL_PATH, path: str = None) -> str:
+    """Converts the Keras LSTM-AE to TFLite or ONNX (batch dimension left dynamic)."""
+    import tensorflow as tf
+
+    path = path or LSTM_EXPORT_PATHS[fmt]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    model = tf.keras.models.load_model(model_path, compile=False)
+    if fmt == "tflite":
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        # LSTM layers convert to fused builtin ops; select TF ops cover anything left over
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+        with open(path, "wb") as f:
+            f.write(converter.convert())
+    elif fmt == "onnx":
+        import tf2onnx
+
+        signature = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=path)
+    else:
+        raise ValueError(f"Unknown LSTM-AE export format '{fmt}'. Available: {sorted(LSTM_EXPORT_PATHS)}")
+    _record_source(path, model_path)
+    return path
+
+# ===== Parity and benchmark =====
+
+def forest_parity(model, forest: FlatForest, X) -> dict:
+    """Largest differences between sklearn and exported decision_function / predict on X."""
+    expected, actual = model.decision_function(X), forest.decision_function(X)
+    return {
+        "max_abs_diff": float(np.max(np.abs(expected - actual))),
+        "identical": bool(np.array_equal(expected, actual)),
+        "predict_agreement": float(np.mean(model.predict(X) == forest.predict(X))),
+    }
+
+def lstm_parity(reference, runtime, batch: np.ndarray) -> dict:
+    """Largest reconstruction and per-step MAE differences between two LSTM-AE runtimes on one batch."""
+    expected, actual = reference.predict(batch), runtime.predict(batch)
+    expected_mae = np.mean(np.abs(batch - expected), axis=2)
+    actual_mae = np.mean(np.abs(batch - actual), axis=2)
+    return {
+        "max_abs_diff": float(np.max(np.abs(expected - actual))),
+        "max_mae_diff": float(np.max(np.abs(expected_mae - actual_mae))),
+    }
+
+def _startup_seconds(statement: str) -> float:
+    """Wall time of a fresh interpreter importing and loading a model (cold start of an hourly run)."""
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def _latency_seconds(predict, batch, repeats: int = 20) -> float:
+    predict(batch)  # warm-up (allocation, graph tracing)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict(batch)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+def benchmark_runtimes(X_if: np.ndarray = None, lstm_batch: np.ndarray = None) -> list:
+    """
+    Exports the models (if missing), checks parity and times startup and latency per runtime.
+
+    - X_if: IF feature rows (default: 72 random rows); lstm_batch: LSTM-AE input windows
+      (default: 72 random 720x8 windows). Models whose files or libraries are missing are skipped.
+    """
+    rows = []
+    rng = np.random.default_rng(0)
+    if os.path.exists(IF_MODEL_PATH):
+        import joblib
+
+        model = joblib.load(IF_MODEL_PATH)
+        X_if = rng.normal(size=(72, model.n_features_in_)) if X_if is None else np.asarray(X_if)
+        export_isolation_forest(model=model)
+        forest = FlatForest.load(IF_ARRAYS_PATH)
+        for name, runtime, statement in [
+            ("sklearn", model, "import joblib; joblib.load(%r)" % IF_MODEL_PATH),
+            ("arrays", forest, "from scripts.modelling.runtime import load_isolation_forest; load_isolation_forest('arrays')"),
+        ]:
+            rows.append({"model": "isolation_forest", "runtime": name, "startup_s": _startup_seconds(statement),
+                         "latency_s": _latency_seconds(runtime.decision_function, X_if),
+                         **(forest_parity(model, forest, X_if) if name == "arrays" else {})})
+
+    if os.path.exists(LSTM_MODEL_PATH):
+        lstm_batch = rng.normal(size=(72, 720, 8)).astype(np.float32) if lstm_batch is None else lstm_batch
+        reference = None
+        for name in ["keras"] + list(LSTM_EXPORT_PATHS):
+            try:
+                if name != "keras" and not export_is_current(LSTM_EXPORT_PATHS[name], LSTM_MODEL_PATH):
+                    export_lstm_ae(name)
+                runtime = load_lstm_ae(name)
+            except ImportError as e:
+                print(f"Skipping {name} runtime: {e}")
+                continue
+            reference = reference or runtime
+            statement = f"from scripts.modelling.runtime import load_lstm_ae; load_lstm_ae({name!r})"
+            rows.append({"model": "lstm_ae", "runtime": name, "startup_s": _startup_seconds(statement),
+                         "latency_s": _latency_seconds(runtime.predict, lstm_batch),
+                         **(lstm_parity(reference, runtime, lstm_batch) if runtime is not reference else {})})
+    return rows
+
+if __name__ == "__main__":
+    # Export + parity + benchmark: python -m scripts.modelling.runtime
+    results = benchmark_runtimes()
+    if not results:
+        print(f"No models found in {MODELS_DIR}")
+    for row in results:
+        extra = ", ".join(f"{k} {v:.3g}" if isinstance(v, float) else f"{k} {v}"
+                          for k, v in row.items() if k not in ("model", "runtime", "startup_s", "latency_s"))
+        print(f"{row['model']:>16} {row['runtime']:>8}: startup {row['startup_s']:.2f} s, "
+              f"latency {row['latency_s'] * 1000:.1f} ms" + (f" ({extra})" if extra else ""))
@@ -0,0 +1,253 @@
+"""
+Batched LSTM-AE scoring with bounded memory.
+
+The notebooks call `autoencoder.predict` on every window at once, keeping the full
+(n_seq, 720, 8) reconstruction in memory only to take a mean absolute error. Here windows
+are streamed through the model LSTM_SCORING_BATCH_SIZE at a time and each batch is reduced
+straight away to per-step errors, which are folded into an OverlapErrorAggregator. Peak
+memory is a few batches plus O(series length), whatever the number of windows.
+
+- score_sequences: windows already built (e.g. lstm_sequences.npy, optionally memory-mapped).
+- score_series: windows built and robust-scaled batch by batch from the raw series, so the
+  (n_seq, 720, 8) input array is never materialised either.
+- With workers > 1, batches run on a thread pool (Keras/TensorFlow release the GIL during
+  inference), with at most 2 x workers batches in flight. configure_cpu_threads sets
+  TensorFlow's intra-/inter-op thread pools for the same purpose.
+
+Both return the aggregator and metrics including throughput in windows per second. With a
+WindowResultCache (scripts/modelling/window_cache.py) windows scored in earlier runs are
+looked up by content and only new or changed windows are predicted. With per_feature=True the
+per-feature absolute errors of the same forward pass are aggregated too (aggregator.feature_mean),
+so REA reads per-hour feature attributions instead of predicting the windows again.
+
+For hourly inference only the last FORECAST_TRIM_HOURS rows of the 1440h + 72h combined
+series are kept, yet the notebook scores all 793 stride-1 windows. score_target_horizon
+scores only windows overlapping the target rows (72 of 793 at stride 1, with identical
+target errors), optionally thinned to LSTM_INFERENCE_STRIDE with every target hour still
+covered by at least LSTM_INFERENCE_MIN_COVERAGE windows. sparse_tradeoff reports the error
+and cost of each stride against the full stride-1 run.
+"""
+
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+from config.original_config import (
+    LSTM_SCORING_BATCH_SIZE, LSTM_SCORING_WORKERS, LSTM_INFERENCE_STRIDE, LSTM_INFERENCE_MIN_COVERAGE
+)
+from scripts.modelling.errors import OverlapErrorAggregator
+from scripts.modelling.sequences import SEQUENCE_LENGTH, robust_scale_windows
+
+def configure_cpu_threads(intra_op: int = None, inter_op: int = None):
+    """Sets TensorFlow's CPU thread pools; must run before the model executes its first op."""
+    import tensorflow as tf
+
+    if intra_op:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    if inter_op:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+def predict_batch(model, batch: np.ndarray) -> np.ndarray:
+    """Reconstructs one batch, preferring Keras' predict_on_batch (no per-call data pipeline)."""
+    if hasattr(model, "predict_on_batch"):
+        return np.asarray(model.predict_on_batch(batch))
+    return np.asarray(model.predict(batch))
+
+def reconstruction_errors(batch: np.ndarray, reconstruction: np.ndarray, per_feature: bool = False) -> np.ndarray:
+    """
+    Per-step MAE across features, as np.mean(np.abs(X - X_recon), axis=2) in the notebooks.
+
+    - per_feature: return the (n, steps, features) absolute errors instead (their mean over the
+      last axis is the per-step MAE).
+    """
+    errors = np.abs(batch - reconstruction)
+    return errors if per_feature else np.mean(errors, axis=2)
+
+def score_windows(model, load_batch, starts, n_rows: int, sequence_length: int = SEQUENCE_LENGTH,
+                  batch_size: int = LSTM_SCORING_BATCH_SIZE, workers: int = LSTM_SCORING_WORKERS,
+                  cache=None, load_raw=None, per_feature: bool = False):
+    """
+    Streams windows through the model and aggregates per-hour errors.
+
+    - `load_batch(positions)` returns the model inputs for the windows at `positions` in `starts`.
+    - `starts` are the row offsets of the windows in a series of `n_rows` rows.
+    - With a WindowResultCache, windows are looked up by the content of `load_raw(positions)`
+      (default: the model inputs) and only misses are predicted.
+    - per_feature: aggregate per-feature errors as well (cached separately from per-step ones).
+    - Returns (OverlapErrorAggregator, metrics).
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    aggregator = OverlapErrorAggregator(n_rows, sequence_length)
+    bounds = [(begin, min(begin + batch_size, len(starts))) for begin in range(0, len(starts), batch_size)]
+    load_raw = load_raw or load_batch
+    predicted = 0
+
+    def run(bound):
+        positions = np.arange(*bound)
+        if cache is None:
+            batch = load_batch(positions)
+            return positions, reconstruction_errors(batch, predict_batch(model, batch), per_feature), len(positions)
+
+        keys = cache.keys_for(load_raw(positions), variant="per_feature" if per_feature else "")
+        cached = cache.get_many(keys)
+        missing = [i for i, value in enumerate(cached) if value is None]
+        if missing:
+            batch = load_batch(positions[missing])
+            errors = reconstruction_errors(batch, predict_batch(model, batch), per_feature)
+            cache.put_many([keys[i] for i in missing], errors)
+            for i, value in zip(missing, errors):
+                cached[i] = value
+        return positions, np.stack(cached), len(missing)
+
+    started = time.perf_counter()
+    if workers <= 1:
+        for bound in bounds:
+            positions, errors, n_predicted = run(bound)
+            aggregator.add(starts[positions], errors)
+            predicted += n_predicted
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for bound in bounds:
+                pending.append(executor.submit(run, bound))
+                if len(pending) >= 2 * workers:
+                    positions, errors, n_predicted = pending.popleft().result()
+                    aggregator.add(starts[positions], errors)
+                    predicted += n_predicted
+            while pending:
+                positions, errors, n_predicted = pending.popleft().result()
+                aggregator.add(starts[positions], errors)
+                predicted += n_predicted
+    elapsed = time.perf_counter() - started
+
+    metrics = {
+        "windows": len(starts),
+        "predicted_windows": predicted,
+        "batches": len(bounds),
+        "batch_size": batch_size,
+        "workers": workers,
+        "seconds": elapsed,
+        "windows_per_second": len(starts) / elapsed if elapsed > 0 else float("inf"),
+    }
+    if cache is not None:
+        metrics["cache"] = cache.stats()
+    return aggregator, metrics
+
+def score_sequences(model, sequences: np.ndarray, starts=None, n_rows: int = None, **kwargs):
+    """
+    Scores prebuilt (n_seq, sequence_length, n_features) windows.
+
+    - Defaults to stride-1 windows (starts 0..n_seq-1), as built by the inference notebook.
+    """
+    sequence_length = sequences.shape[1]
+    starts = np.arange(len(sequences)) if starts is None else np.asarray(starts)
+    n_rows = int(starts.max()) + sequence_length if n_rows is None else n_rows
+    return score_windows(model, lambda positions: np.asarray(sequences[positions]), starts, n_rows,
+                         sequence_length=sequence_length, **kwargs)
+
+def score_series(model, data_array: np.ndarray, feature_indices, starts=None,
+                 sequence_length: int = SEQUENCE_LENGTH, **kwargs):
+    """
+    Scores windows of a raw (n_rows, n_features) series, robust-scaling each batch on the fly.
+
+    - `starts` defaults to every stride-1 window; otherwise e.g. select_window_starts output.
+    - A cache is keyed on the raw (unscaled) windows, so hits skip the scaling too.
+    """
+    data_array = np.asarray(data_array)
+    windows = sliding_window_view(data_array, sequence_length, axis=0).transpose(0, 2, 1)
+    starts = np.arange(len(windows)) if starts is None else np.asarray(starts)
+
+    def load_raw(positions):
+        return windows[starts[positions]]
+
+    def load_batch(positions):
+        return robust_scale_windows(load_raw(positions), feature_indices)
+
+    return score_windows(model, load_batch, starts, len(data_array), sequence_length=sequence_length,
+                         load_raw=load_raw, **kwargs)
+
+def target_window_starts(n_rows: int, n_target: int, sequence_length: int = SEQUENCE_LENGTH,
+                         stride: int = LSTM_INFERENCE_STRIDE, min_coverage: int = LSTM_INFERENCE_MIN_COVERAGE) -> np.ndarray:
+    """
+    Starts of the windows to score so that the last `n_target` rows get an error.
+
+    - Only windows overlapping the target rows are candidates; stride 1 takes all of them,
+      which gives exactly the target errors of scoring every window.
+    - With stride > 1, windows are taken every `stride` starts back from the last window, then
+      windows are added until every target row is covered by min(min_coverage, candidates) windows.
+    """
+    last = n_rows - sequence_length
+    if last < 0:
+        return np.array([], dtype=np.int64)
+    first = max(0, n_rows - n_target - sequence_length + 1)
+    selected = set(range(last, first - 1, -max(stride, 1)))
+
+    for row in range(n_rows - n_target, n_rows):
+        covering = range(max(first, row - sequence_length + 1), min(last, row) + 1)
+        needed = min(min_coverage, len(covering)) - sum(start in selected for start in covering)
+        # Add the missing windows nearest the row's own position, latest first
+        for start in reversed(covering):
+            if needed <= 0:
+                break
+            if start not in selected:
+                selected.add(start)
+                needed -= 1
+    return np.array(sorted(selected), dtype=np.int64)
+
+def score_target_horizon(model, data_array: np.ndarray, feature_indices, n_target: int,
+                         stride: int = LSTM_INFERENCE_STRIDE, min_coverage: int = LSTM_INFERENCE_MIN_COVERAGE,
+                         sequence_length: int = SEQUENCE_LENGTH, per_feature: bool = False, **kwargs):
+    """
+    Scores only the windows covering the last `n_target` rows of the series.
+
+    - Returns (per-row errors of the target rows, metrics); metrics add the number of windows a
+      full stride-1 run would score.
+    - per_feature: returns (errors, (n_target, n_features) per-feature errors, metrics) instead.
+    """
+    data_array = np.asarray(data_array)
+    starts = target_window_starts(len(data_array), n_target, sequence_length, stride, min_coverage)
+    aggregator, metrics = score_series(model, data_array, feature_indices, starts=starts,
+                                       sequence_length=sequence_length, per_feature=per_feature, **kwargs)
+    metrics.update({
+        "stride": stride,
+        "min_coverage": min_coverage,
+        "full_windows": max(len(data_array) - sequence_length + 1, 0),
+        "min_target_coverage": int(aggregator.counts[-n_target:].min()) if n_target else 0,
+    })
+    if per_feature:
+        return aggregator.mean()[-n_target:], aggregator.feature_mean()[-n_target:], metrics
+    return aggregator.mean()[-n_target:], metrics
+
+def sparse_tradeoff(model, data_array: np.ndarray, feature_indices, n_target: int, strides=(1, 2, 4, 8, 24),
+                    min_coverage: int = 1, threshold: float = None, sequence_length: int = SEQUENCE_LENGTH, **kwargs) -> list:
+    """
+    Accuracy versus cost of sparse target scoring, against scoring every stride-1 window.
+
+    - One dict per stride (plus 'full'): windows scored, seconds, cost relative to the full run,
+      max/mean absolute error difference on the target rows and, given `threshold`, the share of
+      target rows whose anomaly flag (error > threshold) agrees with the full run.
+    """
+    aggregator, full_metrics = score_series(model, data_array, feature_indices,
+                                            sequence_length=sequence_length, **kwargs)
+    reference = aggregator.mean()[-n_target:]
+    rows = [{"stride": "full", "windows": full_metrics["windows"], "seconds": full_metrics["seconds"],
+             "relative_cost": 1.0, "max_abs_diff": 0.0, "mean_abs_diff": 0.0}]
+    for stride in strides:
+        errors, metrics = score_target_horizon(model, data_array, feature_indices, n_target, stride, min_coverage,
+                                               sequence_length, **kwargs)
+        diff = np.abs(errors - reference)
+        row = {
+            "stride": stride,
+            "windows": metrics["windows"],
+            "seconds": metrics["seconds"],
+            "relative_cost": metrics["windows"] / full_metrics["windows"],
+            "max_abs_diff": float(np.nanmax(diff)),
+            "mean_abs_diff": float(np.nanmean(diff)),
+        }
+        if threshold is not None:
+            row["flag_agreement"] = float(np.mean((errors > threshold) == (reference > threshold)))
+        rows.append(row)
+    if threshold is not None:
+        rows[0]["flag_agreement"] = 1.0
+    return rows
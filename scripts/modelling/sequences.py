@@ -0,0 +1,201 @@
+"""
+LSTM-AE sequence construction shared by training and inference.
+
+Replaces the per-window loop of `construct_lstm_sequences` in notebook_jeremy_ETL_and_ML and
+notebook_jeremy_inference (slice, robust-scale with per-column np.median/np.percentile, copy,
+np.stack) with a batched builder:
+
+- Windows are strided views of the input array (sliding_window_view), so no copy is made
+  until a chunk is scaled into the output.
+- Anomaly counts per window come from a cumulative sum of the anomaly flags.
+- Median and IQR are read from one sort of a whole chunk of windows along the time axis
+  (using numpy's median/percentile arithmetic, so the values are the same).
+- Work is chunked (SEQUENCE_CHUNK_SIZE windows) so temporary memory stays bounded; the only
+  full-size allocation is the output array itself.
+
+The output is identical to the notebook code. Run `python -m scripts.modelling.sequences`
+to benchmark both on synthetic hourly data.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scripts.features.engineering import LSTM_INPUT_COLS
+
+SEQUENCE_LENGTH = 720
+SEQUENCE_CHUNK_SIZE = 512  # Windows scaled per batch
+SCALE_EPS = 1e-5
+FEATURES_TO_SCALE = ["temperature_2m", "surface_pressure", "wind_speed_10m"]
+
+def robust_scale_sequence(sequence: np.ndarray, feature_indices, eps: float = SCALE_EPS) -> np.ndarray:
+    """Robust-scales (median and IQR) the selected columns of one (length, n_features) sequence."""
+    return robust_scale_windows(sequence[None], feature_indices, eps)[0]
+
+def _lerp(a: np.ndarray, b: np.ndarray, gamma: float) -> np.ndarray:
+    # numpy's two-sided linear interpolation (np.percentile, method='linear')
+    if gamma >= 0.5:
+        return b - (b - a) * (1 - gamma)
+    return a + (b - a) * gamma
+
+def window_median_quartiles(cols: np.ndarray):
+    """
+    Median, 25th and 75th percentiles of each row of `cols` (n_windows, length) from a single sort.
+
+    - Equal to np.median(cols, axis=1) and np.percentile(cols, [25, 75], axis=1); rows with NaNs give NaN.
+    """
+    ordered = np.sort(cols, axis=1)
+    n = cols.shape[1]
+    mid = n // 2
+    median = ordered[:, mid] if n % 2 else np.mean(ordered[:, mid - 1:mid + 1], axis=1)
+    quartiles = []
+    for q in (0.25, 0.75):
+        virtual_index = (n - 1) * q
+        previous_index = int(np.floor(virtual_index))
+        if previous_index >= n - 1:
+            quartiles.append(ordered[:, n - 1])
+        else:
+            quartiles.append(_lerp(ordered[:, previous_index], ordered[:, previous_index + 1], virtual_index - previous_index))
+    has_nan = np.isnan(ordered[:, -1])  # NaNs sort last
+    if has_nan.any():
+        for stat in [median] + quartiles:
+            stat[has_nan] = np.nan
+    return median, quartiles[0], quartiles[1]
+
+def robust_scale_windows(windows: np.ndarray, feature_indices, eps: float = SCALE_EPS, out: np.ndarray = None) -> np.ndarray:
+    """
+    Robust-scales the selected columns of a batch of windows shaped (n_windows, length, n_features).
+
+    - Each window is scaled by its own median and IQR, as robust_scale_sequence.
+    - Writes into `out` if given (same shape), otherwise into a copy.
+    """
+    if out is None:
+        out = np.array(windows, copy=True)
+    else:
+        out[...] = windows
+    for i in feature_indices:
+        cols = windows[:, :, i]
+        median, q25, q75 = window_median_quartiles(cols)
+        out[:, :, i] = (cols - median[:, None]) / ((q75 - q25) + eps)[:, None]
+    return out
+
+def window_anomaly_counts(is_anomaly, sequence_length: int) -> np.ndarray:
+    """Number of flagged rows in every window of `sequence_length` rows (stride 1), via a cumulative sum."""
+    cumulative = np.concatenate([[0], np.cumsum(np.asarray(is_anomaly, dtype=bool), dtype=np.int64)])
+    return cumulative[sequence_length:] - cumulative[:-sequence_length]
+
+def select_window_starts(df: pd.DataFrame, sequence_length: int, sequence_stride: int = 1,
+                         max_allowed_anomalies: int = None):
+    """
+    Start offsets of the windows kept for the LSTM-AE, with the notebook's debug counts.
+
+    - Windows with more than `max_allowed_anomalies` rows flagged in 'is_if_anomaly' are skipped
+      (no filtering if the column is missing or the limit is None).
+    """
+    total_windows = len(df) - sequence_length + 1
+    starts = np.arange(0, max(total_windows, 0), sequence_stride)
+    debug_counts = {"total": len(starts), "has_anomalies": 0, "added": 0}
+
+    if max_allowed_anomalies is not None and "is_if_anomaly" in df.columns and len(starts):
+        counts = window_anomaly_counts(df["is_if_anomaly"].astype(bool).values, sequence_length)[starts]
+        keep = counts <= max_allowed_anomalies
+        debug_counts["has_anomalies"] = int((~keep).sum())
+        starts = starts[keep]
+    debug_counts["added"] = len(starts)
+    return starts, debug_counts
+
+def construct_lstm_sequences(
+    df: pd.DataFrame,
+    sequence_length: int = SEQUENCE_LENGTH,
+    sequence_stride: int = 1,
+    max_allowed_anomalies: int = None,
+    lstm_input_cols_all=None,
+    feature_indices=None,
+    chunk_size: int = SEQUENCE_CHUNK_SIZE,
+):
+    """
+    Builds robust-scaled LSTM-AE sequences from an hourly DataFrame.
+
+    - Windows are selected with select_window_starts (stride and anomaly filter).
+    - Returns (sequences, sequence_starts, debug_counts): a (n_sequences, sequence_length, n_features)
+      array, the start index values of the retained windows and the window counts, matching np.stack
+      of the notebook's sequence list.
+    """
+    lstm_input_cols_all = LSTM_INPUT_COLS if lstm_input_cols_all is None else lstm_input_cols_all
+    if feature_indices is None:
+        feature_indices = [lstm_input_cols_all.index(f) for f in FEATURES_TO_SCALE]
+    data_array = df[lstm_input_cols_all].values
+    index_array = df.index.values
+
+    starts, debug_counts = select_window_starts(df, sequence_length, sequence_stride, max_allowed_anomalies)
+    sequences = np.empty((len(starts), sequence_length, data_array.shape[1]), dtype=data_array.dtype)
+    if len(starts):
+        # View of shape (total_windows, n_features, sequence_length) -> (total_windows, sequence_length, n_features)
+        windows = sliding_window_view(data_array, sequence_length, axis=0).transpose(0, 2, 1)
+        for begin in range(0, len(starts), chunk_size):
+            chunk = starts[begin:begin + chunk_size]
+            robust_scale_windows(windows[chunk], feature_indices, out=sequences[begin:begin + len(chunk)])
+    return sequences, index_array[starts], debug_counts
+
+def _notebook_construct_lstm_sequences(df, sequence_length, sequence_stride, max_allowed_anomalies,
+                                       lstm_input_cols_all, feature_indices):
+    """Training-notebook loop (step 5.3), kept only as the benchmark and equality baseline."""
+    def scale(sequence):
+        sequence = sequence.copy()
+        for i in feature_indices:
+            col = sequence[:, i]
+            median = np.median(col)
+            iqr = np.percentile(col, 75) - np.percentile(col, 25)
+            sequence[:, i] = (col - median) / (iqr + SCALE_EPS)
+        return sequence
+
+    is_anomaly = df["is_if_anomaly"].astype(bool).values
+    data_array = df[lstm_input_cols_all].values
+    index_array = df.index.values
+    sequences, sequence_starts = [], []
+    debug_counts = {"total": 0, "has_anomalies": 0, "added": 0}
+    for start in range(0, len(df) - sequence_length + 1, sequence_stride):
+        end = start + sequence_length
+        debug_counts["total"] += 1
+        if np.count_nonzero(is_anomaly[start:end]) > max_allowed_anomalies:
+            debug_counts["has_anomalies"] += 1
+            continue
+        sequences.append(scale(data_array[start:end]))
+        sequence_starts.append(index_array[start])
+        debug_counts["added"] += 1
+    return sequences, sequence_starts, debug_counts
+
+def benchmark_sequences(years: int = 8, sequence_stride: int = 1, max_allowed_anomalies: int = 24) -> dict:
+    """
+    Time construct_lstm_sequences against the notebook loop on `years` of hourly data.
+
+    - Returns seconds for each path and whether sequences, starts and counts are identical.
+    """
+    from scripts.features.engineering import synthetic_hourly_data, compute_if_features, add_time_features
+
+    df = add_time_features(compute_if_features(synthetic_hourly_data(years))).dropna()
+    df["is_if_anomaly"] = (df["temperature_2m_z"].abs() > 2.5).astype(int)
+    args = (df, SEQUENCE_LENGTH, sequence_stride, max_allowed_anomalies, LSTM_INPUT_COLS,
+            [LSTM_INPUT_COLS.index(f) for f in FEATURES_TO_SCALE])
+
+    started = time.perf_counter()
+    sequences, starts, counts = construct_lstm_sequences(*args)
+    results = {"windows": counts["total"], "batched": time.perf_counter() - started}
+
+    started = time.perf_counter()
+    notebook_sequences, notebook_starts, notebook_counts = _notebook_construct_lstm_sequences(*args)
+    notebook_sequences = np.stack(notebook_sequences)
+    results["notebook"] = time.perf_counter() - started
+
+    results["identical"] = (
+        counts == notebook_counts
+        and np.array_equal(starts, np.array(notebook_starts))
+        and np.array_equal(sequences, notebook_sequences, equal_nan=True)
+    )
+    return results
+
+if __name__ == "__main__":
+    # Benchmark: python -m scripts.modelling.sequences
+    timings = benchmark_sequences(years=2, sequence_stride=4)
+    print(f"{timings['windows']} windows: notebook {timings['notebook']:.2f} s, batched {timings['batched']:.2f} s "
+          f"({timings['notebook'] / timings['batched']:.1f}x), identical output: {timings['identical']}")
@@ -0,0 +1,140 @@
+"""
+Content-addressed cache of LSTM-AE window results.
+
+From one hourly run to the next the combined history + forecast shifts by one hour, so most
+720-step windows have already been scored; only windows touching changed forecast rows are
+new. WindowResultCache maps a hash of a window's raw input values (plus a namespace for the
+model and scaling settings) to its per-step reconstruction errors, so scoring only pushes
+unseen windows through the model.
+
+- Entries are evicted least-recently-used beyond `max_entries`.
+- The cache is persisted as one .npz file, written atomically: keys and results are stacked
+  per result shape (per-step and per-feature errors share a cache), with each entry's LRU position.
+- Hits, misses and evictions are counted and exposed through stats().
+- The store itself is generic: scripts/xai/treeshap.py keeps TreeSHAP rows in it too.
+"""
+
+import os
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from config.original_config import LSTM_WINDOW_CACHE_SIZE
+from utils.find_root import find_project_root
+
+WINDOW_CACHE_PATH = os.path.join(find_project_root(), "data", "cache", "lstm_window_cache.npz")
+
+def file_fingerprint(path: str) -> str:
+    """Short content hash of a file, e.g. the model weights, to namespace cached results."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class WindowResultCache:
+    """LRU map from window content hashes to per-step result arrays."""
+
+    def __init__(self, namespace: str = "", max_entries: int = LSTM_WINDOW_CACHE_SIZE, path: str = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def keys_for(self, windows: np.ndarray, variant: str = "") -> list:
+        """
+        Content keys of a batch of windows (n_windows, ...); equal values give equal keys.
+
+        - `variant` separates different results of the same window (e.g. per-feature errors).
+        """
+        prefix = f"{self.namespace}:{variant}".encode() if variant else self.namespace.encode()
+        windows = np.ascontiguousarray(windows, dtype=np.float64)
+        return [hashlib.blake2b(prefix + window.tobytes(), digest_size=16).digest() for window in windows]
+
+    def get_many(self, keys: list) -> list:
+        """Cached results for `keys` (None for misses), marking hits as recently used."""
+        results = []
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                results.append(value)
+        return results
+
+    def put_many(self, keys: list, values):
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = np.asarray(value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def save(self, path: str = None):
+        """Writes the entries grouped by result shape, with their LRU positions, atomically."""
+        path = path or self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        groups = {}
+        with self._lock:
+            for position, (key, value) in enumerate(self._entries.items()):
+                group = groups.setdefault((value.dtype.str, value.shape), ([], [], []))
+                group[0].append(key)
+                group[1].append(value)
+                group[2].append(position)
+        arrays = {}
+        for i, (keys, values, positions) in enumerate(groups.values()):
+            arrays[f"keys_{i}"] = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(-1, 16)
+            arrays[f"values_{i}"] = np.stack(values)
+            arrays[f"positions_{i}"] = np.asarray(positions, dtype=np.int64)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, namespace=np.array(self.namespace), groups=np.array(len(groups)), **arrays)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        """Loads saved entries; a cache saved under another namespace (e.g. another model) is ignored."""
+        with np.load(path) as data:
+            if str(data["namespace"]) != self.namespace:
+                return
+            if "groups" in data:
+                entries = []
+                for i in range(int(data["groups"])):
+                    entries.extend(zip(data[f"positions_{i}"], data[f"keys_{i}"], data[f"values_{i}"]))
+                entries.sort(key=lambda entry: entry[0])
+                entries = [(key, value) for _, key, value in entries]
+            else:
+                # Single-shape file written before results were grouped by shape
+                entries = list(zip(data["keys"], data["values"]))
+        with self._lock:
+            self._entries = OrderedDict((key.tobytes(), value) for key, value in entries)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+def open_window_cache(model_path: str, settings: str = "", path: str = WINDOW_CACHE_PATH) -> WindowResultCache:
+    """
+    Opens the persisted cache for a model file.
+
+    - The namespace combines the model's content hash with `settings` (e.g. sequence length and
+      scaled features), so retraining or changing the scaling never serves stale results.
+    """
+    return WindowResultCache(namespace=f"{file_fingerprint(model_path)}:{settings}", path=path)
@@ -0,0 +1,135 @@
+"""
+Tree Path Analysis (TPA) for the Isolation Forest.
+
+TPA scores how often each feature is used to split on a sample's path through the forest:
+the number of splits on the feature across all trees, divided by the number of trees. The
+XAI notebook computes it with iterrows() and a Python node-by-node walk (tree_path_features)
+through each of the 100 estimators, i.e. rows x trees x depth interpreter steps, plus a
+separate tree.decision_path loop for the path matrices.
+
+Here the whole snapshot goes through one FlatForest traversal (scripts/modelling/forest.py).
+The split counts are decision_path @ node_feature_indicator, precomputed once per node, so a
+sample's counts are the sum of the rows of the leaves it reaches:
+
+- tree_path_analysis: the notebook's tpa_df (index of the snapshot, one column per IF feature)
+- path_lengths: nodes visited per sample and tree (decision_path nnz in the notebook)
+- decision_paths: the sparse path matrix and node-feature indicator, for the same product
+
+Rows follow sklearn's decision_path (features cast to float32, NaNs routed as at training).
+Run `python -m scripts.xai.tpa` to compare with the notebook loop.
+"""
+
+import time
+import weakref
+import numpy as np
+import pandas as pd
+from scripts.features.engineering import IF_FEATURES
+from scripts.modelling.forest import FlatForest
+
+_FLAT_FORESTS = weakref.WeakKeyDictionary()
+
+def as_flat_forest(model) -> FlatForest:
+    """FlatForest for a fitted IsolationForest (flattened once per model object) or a FlatForest."""
+    if isinstance(model, FlatForest):
+        return model
+    forest = _FLAT_FORESTS.get(model)
+    if forest is None:
+        forest = _FLAT_FORESTS[model] = FlatForest.from_model(model)
+    return forest
+
+def _feature_matrix(X, feature_names):
+    if isinstance(X, pd.DataFrame):
+        return X[feature_names].to_numpy(), X.index
+    X = np.asarray(X)
+    return X, pd.RangeIndex(len(X))
+
+def tree_path_analysis(model, X, feature_names: list = IF_FEATURES) -> pd.DataFrame:
+    """
+    Share of trees splitting on each feature along every sample's paths (the notebook's tpa_df).
+
+    - X: snapshot DataFrame (its `feature_names` columns are used) or an (n, n_features) array.
+    - Returns a DataFrame indexed like X with one column per feature.
+    """
+    forest = as_flat_forest(model)
+    values, index = _feature_matrix(X, feature_names)
+    counts = forest.traverse(values)["split_counts"]
+    return pd.DataFrame(counts / forest.n_estimators, index=index, columns=list(feature_names))
+
+def path_lengths(model, X, feature_names: list = IF_FEATURES) -> pd.DataFrame:
+    """Nodes visited (root and leaf included) per sample and tree, one column per estimator."""
+    forest = as_flat_forest(model)
+    values, index = _feature_matrix(X, feature_names)
+    return pd.DataFrame(forest.traverse(values, split_counts=False)["path_lengths"] + 1, index=index)
+
+def decision_paths(model, X, feature_names: list = IF_FEATURES):
+    """
+    Sparse path matrix of the snapshot over all trees and the node-feature indicator.
+
+    - Returns (paths (n, n_nodes), tree_offsets, indicator (n_nodes, n_features));
+      paths @ indicator / n_estimators gives the TPA scores.
+    """
+    forest = as_flat_forest(model)
+    values, _ = _feature_matrix(X, feature_names)
+    paths, tree_offsets = forest.decision_path(values)
+    return paths, tree_offsets, forest.node_feature_indicator()
+
+def _notebook_tpa(model, snapshot_df: pd.DataFrame, feature_names: list) -> pd.DataFrame:
+    """Notebook TPA loop (iterrows + tree_path_features), kept only as the benchmark baseline."""
+    from sklearn.tree import _tree
+
+    def tree_path_features(tree, x):
+        tree_ = tree.tree_
+        node, path_features = 0, []
+        while tree_.feature[node] != _tree.TREE_UNDEFINED:
+            path_features.append(tree_.feature[node])
+            node = tree_.children_left[node] if x[tree_.feature[node]] <= tree_.threshold[node] else tree_.children_right[node]
+        return path_features
+
+    all_sample_feature_counts = {}
+    for i, row in snapshot_df.iterrows():
+        feature_counts = {}
+        for estimator in model.estimators_:
+            for f in tree_path_features(estimator, row[feature_names].values):
+                feature_counts[feature_names[f]] = feature_counts.get(feature_names[f], 0) + 1
+        all_sample_feature_counts[i] = feature_counts
+    return pd.DataFrame.from_dict(all_sample_feature_counts, orient="index").fillna(0) / len(model.estimators_)
+
+def benchmark_tpa(n_rows: int = 5000, notebook_rows: int = 200) -> dict:
+    """
+    Times tree_path_analysis against the notebook loop on synthetic IF features.
+
+    - The notebook loop runs on the first `notebook_rows` rows only; seconds are scaled to n_rows.
+    - Also checks that the sparse decision_paths product gives the same scores.
+    """
+    from sklearn.ensemble import IsolationForest
+    from scripts.features.engineering import synthetic_hourly_data, compute_if_features
+
+    features = compute_if_features(synthetic_hourly_data(2))[IF_FEATURES].dropna()
+    model = IsolationForest(n_estimators=100, random_state=42).fit(features.to_numpy())
+    snapshot = features.iloc[:n_rows].astype(np.float32)  # sklearn's input cast, so both walks agree exactly
+    as_flat_forest(model)
+
+    started = time.perf_counter()
+    tpa_df = tree_path_analysis(model, snapshot)
+    seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected = _notebook_tpa(model, snapshot.iloc[:notebook_rows], IF_FEATURES)
+    notebook_seconds = (time.perf_counter() - started) * len(snapshot) / notebook_rows
+
+    paths, _, indicator = decision_paths(model, snapshot)
+    return {
+        "rows": len(snapshot),
+        "vectorised": seconds,
+        "notebook_estimated": notebook_seconds,
+        "identical": bool(tpa_df.iloc[:notebook_rows].equals(expected[IF_FEATURES].astype(np.float64))),
+        "sparse_product_identical": bool(np.array_equal((paths @ indicator).toarray() / model.n_estimators, tpa_df.to_numpy())),
+    }
+
+if __name__ == "__main__":
+    # Benchmark: python -m scripts.xai.tpa
+    timings = benchmark_tpa()
+    print(f"{timings['rows']} rows: notebook ~{timings['notebook_estimated']:.1f} s (extrapolated), "
+          f"vectorised {timings['vectorised'] * 1000:.0f} ms "
+          f"({timings['notebook_estimated'] / timings['vectorised']:.0f}x); identical {timings['identical']}, "
+          f"sparse product identical {timings['sparse_product_identical']}")
@@ -0,0 +1,159 @@
+"""
+Cached TreeSHAP explanations for Isolation Forest scores.
+
+The XAI notebook builds a new shap.TreeExplainer(if_model) and recomputes shap_values for the
+whole inference CSV on every run, although consecutive hourly outputs share most of their rows.
+TreeShapService instead:
+
+- builds the explainer once per model version (content hash) and keeps it warm in the process;
+- keys every row by model hash + feature vector, and only runs TreeSHAP on rows not explained yet;
+- persists the values as a compact array store (.npz) next to the inference output, through
+  the same content-addressed LRU store as the LSTM-AE window results (WindowResultCache).
+
+shap is imported lazily, on the first row that is not in the store.
+Run `python -m scripts.xai.treeshap` to compare a cold run, a warm run and an hourly update.
+"""
+
+import os
+import time
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+from config.original_config import XAI_SHAP_CACHE_SIZE
+from scripts.features.engineering import IF_FEATURES
+from scripts.modelling.window_cache import WindowResultCache, file_fingerprint
+from utils.find_root import find_project_root
+
+INFERENCE_DIR = os.path.join(find_project_root(), "outputs", "modelling", "inference")
+TREESHAP_STORE_FILE = "treeshap_values.npz"
+
+# Warm explainers of this process, by model hash
+_EXPLAINERS = {}
+
+def model_fingerprint(model) -> str:
+    """Content hash of an in-memory model (its pickle); use file_fingerprint for a model file."""
+    return hashlib.blake2b(pickle.dumps(model, protocol=4), digest_size=16).hexdigest()
+
+def treeshap_store_path(inference_path: str = INFERENCE_DIR) -> str:
+    """Store file next to an inference output (a file in the directory, or the directory itself)."""
+    directory = inference_path if os.path.isdir(inference_path) else os.path.dirname(inference_path)
+    return os.path.join(directory, TREESHAP_STORE_FILE)
+
+class TreeShapService:
+    """TreeSHAP values of IF feature rows, computed once per (model, feature vector)."""
+
+    def __init__(self, model, model_hash: str = None, store_path: str = None,
+                 max_entries: int = XAI_SHAP_CACHE_SIZE, feature_names: list = IF_FEATURES):
+        self.model = model
+        self.model_hash = model_hash or model_fingerprint(model)
+        self.feature_names = list(feature_names)
+        self.store = WindowResultCache(namespace=self.model_hash, max_entries=max_entries, path=store_path)
+        self.computed = 0
+
+    @property
+    def explainer(self):
+        explainer = _EXPLAINERS.get(self.model_hash)
+        if explainer is None:
+            import shap
+
+            explainer = _EXPLAINERS[self.model_hash] = shap.TreeExplainer(self.model)
+        return explainer
+
+    @property
+    def expected_value(self) -> float:
+        """Baseline of the explanations (explainer.expected_value[0] in the notebook)."""
+        return float(np.ravel(self.explainer.expected_value)[0])
+
+    def shap_values(self, X) -> np.ndarray:
+        """
+        (n, n_features) SHAP values of the rows of X, computing only rows missing from the store.
+
+        - X: DataFrame (its feature_names columns are used) or an (n, n_features) array.
+        """
+        values = X[self.feature_names].to_numpy(dtype=np.float64) if isinstance(X, pd.DataFrame) \
+            else np.asarray(X, dtype=np.float64)
+        if not len(values):
+            return np.empty((0, len(self.feature_names)))
+        keys = self.store.keys_for(values)
+        results = self.store.get_many(keys)
+        missing = [i for i, value in enumerate(results) if value is None]
+        if missing:
+            # Repeated rows in one call are explained once
+            first = {}
+            for i in missing:
+                first.setdefault(keys[i], i)
+            rows = list(first.values())
+            computed = np.asarray(self.explainer.shap_values(values[rows]), dtype=np.float64)
+            self.store.put_many([keys[i] for i in rows], computed)
+            self.computed += len(rows)
+            by_key = dict(zip((keys[i] for i in rows), computed))
+            for i in missing:
+                results[i] = by_key[keys[i]]
+        return np.stack(results)
+
+    def explain_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """SHAP values as a DataFrame indexed like df, one column per feature."""
+        return pd.DataFrame(self.shap_values(df), index=df.index, columns=self.feature_names)
+
+    def stats(self) -> dict:
+        return {**self.store.stats(), "computed": self.computed}
+
+    def save(self):
+        if self.store.path:
+            self.store.save()
+
+def open_treeshap_service(model_path: str, inference_path: str = INFERENCE_DIR, model=None) -> TreeShapService:
+    """
+    Service for a model file, with its store next to `inference_path`.
+
+    - The model version is the file's content hash, so a retrained model starts a new store.
+    """
+    if model is None:
+        import joblib
+
+        model = joblib.load(model_path)
+    return TreeShapService(model, model_hash=file_fingerprint(model_path), store_path=treeshap_store_path(inference_path))
+
+def benchmark_treeshap(n_rows: int = 72, path: str = None) -> dict:
+    """
+    Times the notebook (new explainer + shap_values on all rows) against a cold and a warm service
+    on `n_rows` synthetic IF rows, then an hourly update where one row is new.
+    """
+    import shap
+    import tempfile
+    from sklearn.ensemble import IsolationForest
+    from scripts.features.engineering import synthetic_hourly_data, compute_if_features
+
+    features = compute_if_features(synthetic_hourly_data(2))[IF_FEATURES].dropna()
+    model = IsolationForest(n_estimators=100, random_state=42).fit(features.to_numpy())
+    snapshot, next_snapshot = features.iloc[-n_rows - 1:-1], features.iloc[-n_rows:]
+    path = path or os.path.join(tempfile.mkdtemp(), TREESHAP_STORE_FILE)
+
+    started = time.perf_counter()
+    expected = shap.TreeExplainer(model).shap_values(snapshot)
+    results = {"rows": n_rows, "notebook": time.perf_counter() - started}
+
+    service = TreeShapService(model, store_path=path)
+    for name, frame in (("cold", snapshot), ("warm", snapshot), ("hourly", next_snapshot)):
+        computed = service.computed
+        started = time.perf_counter()
+        values = service.shap_values(frame)
+        results[name] = time.perf_counter() - started
+        results[f"{name}_computed"] = service.computed - computed
+    service.save()
+
+    reloaded = TreeShapService(model, model_hash=service.model_hash, store_path=path)
+    results["identical"] = bool(np.array_equal(reloaded.shap_values(snapshot), expected))
+    results["reloaded_computed"] = reloaded.computed
+    results["hourly_identical"] = bool(np.allclose(values, shap.TreeExplainer(model).shap_values(next_snapshot)))
+    return results
+
+if __name__ == "__main__":
+    # Benchmark: python -m scripts.xai.treeshap
+    timings = benchmark_treeshap()
+    print(f"{timings['rows']} rows: notebook {timings['notebook'] * 1000:.0f} ms, "
+          + ", ".join(f"{name} {timings[name] * 1000:.1f} ms ({timings[name + '_computed']} computed)"
+                      for name in ("cold", "warm", "hourly"))
+          + f"; identical after reload {timings['identical']} ({timings['reloaded_computed']} computed), "
+          f"hourly identical {timings['hourly_identical']}")
@@ -0,0 +1,51 @@
+"""Streaming t_now statistics (scripts/features/state.py) against compute_tnow_stats."""
+
+import numpy as np
+import pytest
+from scripts.features.engineering import WINDOW_60D, compute_tnow_stats, synthetic_hourly_data
+from scripts.features.state import FeatureState, update_feature_state
+
+@pytest.fixture(scope="module")
+def history():
+    return synthetic_hourly_data(1).iloc[:2 * WINDOW_60D + 24]
+
+def _assert_same_stats(state, df_hist):
+    expected = compute_tnow_stats(df_hist)
+    stats = state.stats()
+    assert stats.keys() == expected.keys()
+    for key, value in expected.items():
+        assert np.array_equal(stats[key], value, equal_nan=True), key
+
+def test_streamed_state_matches_batch_statistics(history):
+    state = FeatureState.from_history(history.iloc[:WINDOW_60D])
+    for end in range(WINDOW_60D + 1, len(history) + 1, 50):
+        state.update(history.iloc[end - 50:end])
+        _assert_same_stats(state, history.iloc[end - WINDOW_60D:end])
+
+def test_revised_hours_match_batch_statistics(history):
+    state = FeatureState.from_history(history.iloc[:WINDOW_60D])
+    revised = history.iloc[WINDOW_60D - 48:WINDOW_60D].copy()
+    revised["wind_speed_10m"] += 1.5
+    revised["temperature_2m"] -= 0.3
+    assert state.update(revised) == {"pushed": 0, "revised": 48}
+
+    expected = history.iloc[:WINDOW_60D].copy()
+    expected.iloc[-48:] = revised
+    _assert_same_stats(state, expected)
+
+def test_gap_without_full_history_raises_and_keeps_saved_state(history, tmp_path):
+    path = str(tmp_path / "feature_state.json")
+    update_feature_state(history.iloc[:WINDOW_60D], path=path)
+    saved = open(path).read()
+
+    with pytest.raises(ValueError, match="full 1440h history"):
+        update_feature_state(history.iloc[WINDOW_60D + 1:WINDOW_60D + 3], path=path)
+    assert open(path).read() == saved
+
+    # A full window after the gap replaces the saved state
+    state = update_feature_state(history.iloc[-WINDOW_60D:], path=path)
+    _assert_same_stats(state, history.iloc[-WINDOW_60D:])
+
+def test_first_run_needs_the_full_window(history, tmp_path):
+    with pytest.raises(ValueError):
+        update_feature_state(history.iloc[:24], path=str(tmp_path / "feature_state.json"))
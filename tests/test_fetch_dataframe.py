@@ -0,0 +1,43 @@
+"""Fast-path decoding of Open-Meteo payloads (utils/fetch_dataframe.py)."""
+
+import numpy as np
+import pandas as pd
+from utils.fetch_dataframe import decode_hourly_payload, _regular_hourly_index
+
+def _times(n=1441, start="2025-03-01"):
+    return pd.date_range(start, periods=n, freq="h").strftime("%Y-%m-%dT%H:%M").tolist()
+
+def test_regular_series_uses_the_arithmetic_index():
+    times = _times()
+    index = _regular_hourly_index(times)
+
+    assert index is not None
+    assert np.array_equal(index, pd.to_datetime(times).to_numpy())
+
+def test_cancelling_gap_and_duplicate_fall_back_to_parsing():
+    times = _times()
+    # One hour missing and a later hour repeated: same count, same first and last timestamp
+    times = times[:100] + times[101:700] + [times[700]] + times[700:]
+    assert len(times) == 1441
+    assert _regular_hourly_index(times) is None
+
+    df = decode_hourly_payload({"hourly": {"time": times, "temperature_2m": [1.0] * len(times)}})
+    assert df["date"].is_unique
+    assert len(df) == 1440
+
+def test_unparseable_timestamps_fall_back_to_parsing():
+    times = [t + "+00:00" for t in _times(48)]
+    assert _regular_hourly_index(times) is None
+
+def test_decoded_values_round_trip_through_csv_unchanged(tmp_path):
+    times = _times(48)
+    values = [12.3, -0.1, None] + [1013.7] * 45
+    df = decode_hourly_payload({"hourly": {"time": times, "surface_pressure": values}})
+    # Incremental runs concat fresh rows with rows read back from the previous CSV
+    df.to_csv(tmp_path / "window.csv", index=False)
+    written = (tmp_path / "window.csv").read_text()
+    assert "12.3," in written or "12.3\n" in written
+    assert "12.300000190734863" not in written
+    reread = pd.read_csv(tmp_path / "window.csv")
+    assert reread["surface_pressure"].dtype == df["surface_pressure"].dtype
+    assert reread["surface_pressure"].equals(df["surface_pressure"])
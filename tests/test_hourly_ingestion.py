@@ -0,0 +1,32 @@
+"""Failure isolation between site batches of the hourly ingestion."""
+
+import pytest
+import requests
+import scripts.etl.hourly_forecast_rolling_ingestion as ingestion
+
+def test_http_errors_after_retries_do_not_abandon_other_batches(monkeypatch):
+    sites = [{"id": f"site_{i}"} for i in range(3)]
+    failures = {
+        "site_0": requests.HTTPError("503 Server Error"),
+        "site_1": requests.ConnectionError("connection refused"),
+    }
+    ingested, messages = [], []
+
+    def ingest_batch(anchor, batch, prev_until, prev_windows):
+        site_id = batch[0]["id"]
+        if site_id in failures:
+            raise failures[site_id]
+        ingested.append(site_id)
+
+    monkeypatch.setattr(ingestion, "plan_batches", lambda anchor, sites, incremental: [([site], None, None) for site in sites])
+    monkeypatch.setattr(ingestion, "ingest_batch", ingest_batch)
+    monkeypatch.setattr(ingestion, "start_run_budget", lambda seconds: None)
+    monkeypatch.setattr(ingestion, "log_event", lambda message, **kwargs: messages.append(message))
+
+    with pytest.raises(requests.RequestException):
+        ingestion.main(incremental=False, sites=sites, max_workers=1)
+
+    assert ingested == ["site_2"]
+    assert sum(message.startswith("Failed to fetch data") for message in messages) == 2
+    assert any(message.startswith("HTTP:") for message in messages)
+    assert "Completed hourly ingestion process." not in messages
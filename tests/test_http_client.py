@@ -0,0 +1,154 @@
+"""Cache policy and circuit breaker of the shared HTTP client, against a local stub server."""
+
+import time
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from utils import http_client
+
+class StubServer(ThreadingHTTPServer):
+    """Returns `status` (200) with a tiny JSON body after `delay` seconds and counts the requests it receives."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.status = 200
+        self.delay = 0.0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/archive"
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            status = self.server.status
+        time.sleep(self.server.delay)
+        body = b'{"hourly": {"time": []}}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def cached_archive(server, monkeypatch):
+    """Shared session caching the stub as the archive endpoint, in memory."""
+    requests_cache = pytest.importorskip("requests_cache")
+    session = requests_cache.CachedSession(
+        backend="memory",
+        expire_after=requests_cache.DO_NOT_CACHE,
+        urls_expire_after={http_client._url_pattern(server.url): timedelta(hours=168)},
+        allowable_codes=(200,),
+    )
+    monkeypatch.setattr(http_client, "HISTORICAL_API_URL", server.url)
+    monkeypatch.setattr(http_client, "_session", session)
+    return server
+
+def _params(end_date):
+    return {"start_date": (end_date - timedelta(days=30)).isoformat(), "end_date": end_date.isoformat()}
+
+def test_final_archive_requests_are_served_from_cache(cached_archive):
+    params = _params(datetime.utcnow().date() - timedelta(days=30))
+    first = http_client.http_get(cached_archive.url, params)
+    second = http_client.http_get(cached_archive.url, params)
+
+    assert not first.from_cache and second.from_cache
+    assert cached_archive.requests == 1
+
+@pytest.mark.parametrize("days_ago", [0, 1, 2])
+def test_archive_requests_within_the_lag_bypass_the_cache(cached_archive, days_ago):
+    params = _params(datetime.utcnow().date() - timedelta(days=days_ago))
+    responses = [http_client.http_get(cached_archive.url, params) for _ in range(3)]
+
+    assert not any(response.from_cache for response in responses)
+    assert cached_archive.requests == 3
+    assert len(list(http_client._session.cache.responses.keys())) == 0  # nothing stored either
+
+COOLDOWN = 0.3
+
+@pytest.fixture
+def breaker(server, monkeypatch):
+    """Plain session to the stub, breaker closed, opening after 2 failures for COOLDOWN seconds, no retries."""
+    monkeypatch.setattr(http_client, "_session", requests.Session())
+    monkeypatch.setattr(http_client, "HTTP_MAX_RETRIES", 0)
+    monkeypatch.setattr(http_client, "HTTP_BREAKER_THRESHOLD", 2)
+    monkeypatch.setattr(http_client, "HTTP_BREAKER_COOLDOWN", COOLDOWN)
+    monkeypatch.setattr(http_client, "_consecutive_failures", 0)
+    monkeypatch.setattr(http_client, "_breaker_open_until", 0.0)
+    monkeypatch.setattr(http_client, "_breaker_trial", False)
+    monkeypatch.setattr(http_client, "log_event", lambda *args, **kwargs: None)
+    return server
+
+def _trip(server):
+    server.status = 503
+    for _ in range(2):
+        assert http_client.http_get(server.url, {}).status_code == 503
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.http_get(server.url, {})
+    assert server.requests == 2
+
+def _concurrent_gets(server, n):
+    """n simultaneous http_get calls; returns their responses or exceptions."""
+    results, start = [None] * n, threading.Barrier(n)
+
+    def get(i):
+        start.wait()
+        try:
+            results[i] = http_client.http_get(server.url, {})
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=get, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_half_open_breaker_lets_one_trial_through_then_closes(breaker):
+    _trip(breaker)
+    time.sleep(COOLDOWN)
+    breaker.status, breaker.delay = 200, 0.2
+
+    results = _concurrent_gets(breaker, 5)
+
+    assert breaker.requests == 3  # only the trial reached the server
+    assert sum(isinstance(result, requests.Response) for result in results) == 1
+    assert sum(isinstance(result, http_client.CircuitOpenError) for result in results) == 4
+    breaker.delay = 0.0
+    assert http_client.http_get(breaker.url, {}).status_code == 200  # closed again
+    assert breaker.requests == 4
+
+def test_failed_trial_reopens_the_breaker(breaker):
+    _trip(breaker)
+    time.sleep(COOLDOWN)
+    breaker.delay = 0.2
+
+    results = _concurrent_gets(breaker, 5)
+
+    assert breaker.requests == 3
+    assert sum(isinstance(result, requests.Response) and result.status_code == 503 for result in results) == 1
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.http_get(breaker.url, {})  # open for another cool-down, no request sent
+    assert breaker.requests == 3
+    assert http_client.fetch_metrics()["breaker_trips"] >= 2
@@ -0,0 +1,27 @@
+"""Background log writer (utils/logger.py)."""
+
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import sys, time
+from utils import logger
+logger.LOG_DIR = sys.argv[1]
+logger.LOG_FILE = sys.argv[1] + "/ingestion.log"
+logger.log_event("Malformed API response \\u2013 missing hourly")
+time.sleep(0.5)
+logger.log_event("second record")
+"""
+
+def test_unencodable_console_output_neither_kills_the_writer_nor_hangs_exit(tmp_path):
+    env = {**os.environ, "PYTHONIOENCODING": "ascii", "PYTHONPATH": ROOT}
+    result = subprocess.run([sys.executable, "-c", SCRIPT, str(tmp_path)], cwd=ROOT, env=env,
+                            capture_output=True, timeout=60)
+    assert result.returncode == 0
+    assert b"Malformed API response ? missing hourly" in result.stdout
+    lines = (tmp_path / "ingestion.log").read_text(encoding="utf-8").splitlines()
+    assert lines[0].endswith("Malformed API response – missing hourly")
+    assert lines[1].endswith("second record")
@@ -0,0 +1,117 @@
+"""Throughput of the parallel monthly backfill against a local stub of the archive API."""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import pytest
+from utils import http_client
+import scripts.etl.monthly_historical_ingestion as ingestion
+
+MONTHS = [(2020, month) for month in range(1, 13)]
+RESPONSE_DELAY = 0.1  # seconds the stub takes per request
+
+class StubArchive(ThreadingHTTPServer):
+    """Answers archive requests with one hourly payload per requested site, after a fixed delay."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.active = self.peak = self.requests = 0
+        self.connections = set()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/archive"
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled connections are reused
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.requests += 1
+            server.peak = max(server.peak, server.active)
+            server.connections.add(self.client_address)
+        try:
+            time.sleep(RESPONSE_DELAY)
+            params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+            times = pd.date_range(params["start_date"], f"{params['end_date']} 23:00", freq="h")
+            hourly = {"time": times.strftime("%Y-%m-%dT%H:%M").tolist()}
+            hourly.update({name: [1.0] * len(times) for name in params["hourly"].split(",")})
+            payloads = [{"hourly": hourly} for _ in params["latitude"].split(",")]
+            body = json.dumps(payloads if len(payloads) > 1 else payloads[0]).encode()
+        finally:
+            with server.lock:
+                server.active -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = StubArchive()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    saved = []
+    monkeypatch.setattr(ingestion, "HISTORICAL_API_URL", server.url)
+    monkeypatch.setattr(ingestion, "months_to_fetch", lambda: list(MONTHS))
+    monkeypatch.setattr(ingestion, "find_artefact", lambda directory, filename: None)
+    monkeypatch.setattr(ingestion, "append_partition",
+                        lambda df, year, month, site_id: saved.append((site_id, year, month, len(df))) or f"IFS_{year}_{month:02d}")
+    monkeypatch.setattr(ingestion, "log_event", lambda *args, **kwargs: None)
+    monkeypatch.setattr(http_client, "HTTP_CACHE_ENABLED", False)
+    http_client.reset_fetch_metrics()
+    server.saved = saved
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _run(stub, monkeypatch, workers, sites=None):
+    # A fresh pooled session per run, sized like the shared one for `workers`
+    monkeypatch.setattr(http_client, "_session", http_client.build_session(pool_size=workers))
+    started = time.perf_counter()
+    results = ingestion.run_monthly_ingestion(max_workers=workers, sites=sites)
+    return results, time.perf_counter() - started
+
+def test_serial_backfill_uses_one_connection(stub, monkeypatch):
+    results, _ = _run(stub, monkeypatch, workers=1)
+
+    assert set(results.values()) == {"saved"}
+    assert len(results) == len(MONTHS)
+    assert stub.peak == 1
+    assert len(stub.connections) == 1
+
+def test_parallel_backfill_overlaps_requests_on_pooled_connections(stub, monkeypatch):
+    workers = 4
+    results, elapsed = _run(stub, monkeypatch, workers=workers)
+
+    assert set(results.values()) == {"saved"}
+    assert stub.requests == len(MONTHS)
+    assert 1 < stub.peak <= workers
+    # Connections are kept alive and shared: at most one per worker, not one per month
+    assert len(stub.connections) <= workers
+    # 12 requests of 0.1 s take ~1.2 s serially; 4 workers need about a quarter of that
+    assert elapsed < len(MONTHS) * RESPONSE_DELAY / 2
+    assert sorted((year, month) for _, year, month, _ in stub.saved) == MONTHS
+
+@pytest.mark.parametrize("batch_size, requests", [(1, 3 * len(MONTHS)), (2, 2 * len(MONTHS)), (10, len(MONTHS))])
+def test_site_batches_are_one_request_each(stub, monkeypatch, batch_size, requests):
+    sites = [{"id": f"site{i}", "name": f"site{i}", "latitude": 51.0 + i, "longitude": -0.4} for i in range(3)]
+    monkeypatch.setattr(http_client, "_session", http_client.build_session(pool_size=4))
+    results = ingestion.run_monthly_ingestion(max_workers=4, sites=sites, batch_size=batch_size)
+
+    assert len(results) == len(MONTHS) * len(sites)
+    assert set(results.values()) == {"saved"}
+    assert stub.requests == requests  # one request per (month, batch of sites)
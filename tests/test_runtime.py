@@ -0,0 +1,61 @@
+"""Exported Isolation Forest runtime (scripts/modelling/runtime.py) against sklearn."""
+
+import os
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from scripts.modelling import runtime
+from scripts.modelling.forest import FlatForest
+
+@pytest.fixture
+def features():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 5))
+    X[rng.random(X.shape) < 0.01] = np.nan  # NaNs follow sklearn's missing-value routing
+    return X
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(runtime, "log_event", lambda *args, **kwargs: None)
+    return str(tmp_path / "if_model.joblib"), str(tmp_path / "runtime" / "if_model.npz")
+
+def _fit(X, seed):
+    return IsolationForest(n_estimators=50, random_state=seed).fit(np.nan_to_num(X[:1500]))
+
+def test_exported_forest_matches_sklearn(features, paths):
+    model_path, export_path = paths
+    model = _fit(features, 0)
+    joblib.dump(model, model_path)
+    runtime.export_isolation_forest(model_path, export_path)
+
+    forest = runtime.load_isolation_forest("auto", model_path, export_path)
+    assert isinstance(forest, FlatForest)
+    parity = runtime.forest_parity(model, forest, features)
+    assert parity["identical"] and parity["predict_agreement"] == 1.0
+    assert np.array_equal(forest.score_samples(features), model.score_samples(features))
+
+def test_retrained_model_is_not_shadowed_by_an_old_export(features, paths):
+    model_path, export_path = paths
+    joblib.dump(_fit(features, 0), model_path)
+    runtime.export_isolation_forest(model_path, export_path)
+
+    retrained = _fit(features, 1)
+    joblib.dump(retrained, model_path)
+    assert not runtime.export_is_current(export_path, model_path)
+
+    forest = runtime.load_isolation_forest("auto", model_path, export_path)
+    assert runtime.export_is_current(export_path, model_path)  # re-exported on load
+    assert np.array_equal(forest.decision_function(features), retrained.decision_function(features))
+
+def test_export_without_provenance_is_stale(features, paths):
+    model_path, export_path = paths
+    model = _fit(features, 0)
+    joblib.dump(model, model_path)
+    runtime.export_isolation_forest(model_path, export_path)
+    # An export from before provenance was recorded: no sidecar, unknown source
+    FlatForest.from_model(_fit(features, 2)).save(export_path)
+    os.remove(export_path + ".json")
+
+    forest = runtime.load_isolation_forest("arrays", model_path, export_path)
+    assert np.array_equal(forest.decision_function(features), model.decision_function(features))
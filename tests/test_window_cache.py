@@ -0,0 +1,40 @@
+"""Persisted LSTM-AE window results shared by per-step and per-feature scoring (scripts/modelling/window_cache.py)."""
+
+import numpy as np
+from scripts.modelling.scoring import score_sequences
+from scripts.modelling.window_cache import WindowResultCache
+
+SEQUENCE_LENGTH, N_FEATURES = 720, 8
+
+class HalfModel:
+    """Stand-in autoencoder reconstructing every window as half of itself, counting predicted windows."""
+
+    def __init__(self):
+        self.predicted = 0
+
+    def predict(self, batch):
+        self.predicted += len(batch)
+        return batch / 2
+
+def test_both_variants_survive_save_and_reload(tmp_path):
+    sequences = np.random.default_rng(0).normal(size=(6, SEQUENCE_LENGTH, N_FEATURES))
+    path = str(tmp_path / "window_cache.npz")
+    cache = WindowResultCache(namespace="model", path=path)
+    model = HalfModel()
+    per_step, _ = score_sequences(model, sequences, cache=cache, batch_size=4, workers=1)
+    per_feature, _ = score_sequences(model, sequences, cache=cache, batch_size=4, workers=1, per_feature=True)
+    assert len(cache) == 12
+    cache.save()
+
+    reloaded = WindowResultCache(namespace="model", path=path)
+    assert list(reloaded._entries) == list(cache._entries)
+    for key, value in cache._entries.items():
+        assert reloaded._entries[key].shape == value.shape
+        assert np.array_equal(reloaded._entries[key], value)
+
+    model.predicted = 0
+    again_step, metrics = score_sequences(model, sequences, cache=reloaded, batch_size=4, workers=1)
+    again_feature, _ = score_sequences(model, sequences, cache=reloaded, batch_size=4, workers=1, per_feature=True)
+    assert model.predicted == 0 and metrics["predicted_windows"] == 0
+    assert np.array_equal(again_step.mean(), per_step.mean())
+    assert np.array_equal(again_feature.feature_mean(), per_feature.feature_mean())
@@ -0,0 +1,59 @@
+"""Eager and on-demand explanations persisted to the XAI output the dashboard reads."""
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import IsolationForest
+from scripts.features.engineering import IF_FEATURES, LSTM_FEATURES, compute_if_features, synthetic_hourly_data
+from scripts.xai.explain import XaiExplainer, open_xai_explainer, rea_error_columns
+
+pytest.importorskip("shap")
+
+@pytest.fixture(scope="module")
+def inference_output():
+    features = compute_if_features(synthetic_hourly_data(1))[IF_FEATURES].dropna()
+    model = IsolationForest(n_estimators=50, random_state=42).fit(features.to_numpy())
+    df = features.iloc[-72:].rename_axis("date").reset_index()
+    scores = model.decision_function(df[IF_FEATURES].to_numpy())
+    df["anomaly_label"] = np.where(scores <= np.quantile(scores, 0.1), "Point anomaly", "Normal")
+    df[rea_error_columns()] = np.random.default_rng(0).gamma(2.0, 0.2, (len(df), len(LSTM_FEATURES)))
+    return df, model
+
+def test_lazy_explanations_are_written_back_to_the_output(inference_output, tmp_path):
+    df, model = inference_output
+    path = str(tmp_path / "tpa-treeshap-rea-final.csv")
+    explainer = XaiExplainer(df, model, plot_dir=str(tmp_path / "plots"), render_plots=False)
+    explainer.run()
+    explainer.save(path)
+
+    saved = pd.read_csv(path)
+    eager = (df["anomaly_label"] != "Normal").to_numpy()
+    assert saved.loc[eager, "treeshap_summary"].notna().all()
+    assert saved.loc[~eager, "treeshap_summary"].isna().all()
+
+    normal = int(np.flatnonzero(~eager)[0])
+    explanation = explainer.explain(normal)
+    saved = pd.read_csv(path)
+    assert saved.loc[normal, "treeshap_summary"] == explanation["treeshap_summary"]
+    assert saved["treeshap_summary"].notna().sum() == eager.sum() + 1
+
+def test_explainer_reopened_from_the_output_keeps_saved_explanations(inference_output, tmp_path):
+    df, model = inference_output
+    path = str(tmp_path / "tpa-treeshap-rea-final.csv")
+    model_path = str(tmp_path / "if_model.joblib")
+    joblib.dump(model, model_path)
+    explainer = XaiExplainer(df, model, plot_dir=str(tmp_path / "plots"), render_plots=False)
+    explainer.run()
+    explainer.save(path)
+
+    # A separate process (the dashboard) opens the same output
+    reopened = open_xai_explainer(path, model_path, plot_dir=str(tmp_path / "plots"), render_plots=False)
+    eager = df.index[df["anomaly_label"] != "Normal"]
+    assert all(reopened.is_explained(index) for index in eager)
+    assert reopened.explain(eager[0])["treeshap_summary"] == explainer.explain(eager[0])["treeshap_summary"]
+
+    normal = df.index[df["anomaly_label"] == "Normal"][0]
+    assert not reopened.is_explained(normal)
+    assert reopened.explain(normal)["tpa_summary"] == explainer.explain(normal)["tpa_summary"]
+    assert pd.read_csv(path).loc[normal, "tpa_summary"] == reopened.explain(normal)["tpa_summary"]
@@ -0,0 +1,25 @@
+"""Content-addressed plot file names (scripts/xai/plots.py)."""
+
+import os
+import numpy as np
+import pandas as pd
+from scripts.xai.plots import PlotRenderer, sample_name
+
+def test_timestamp_samples_get_filesystem_safe_names():
+    for sample in (pd.Timestamp("2025-06-03 06:00:00"), np.datetime64("2025-06-03T06:00"),
+                   pd.Timestamp("2025-06-03 06:00", tz="Europe/London").to_pydatetime()):
+        assert sample_name(sample) == "20250603T06"
+    assert sample_name(63) == "63"
+    assert sample_name("site 1/2025:06") == "site-1-2025-06"
+
+def test_rerendered_timestamp_sample_replaces_its_old_file(tmp_path):
+    sample = pd.Timestamp("2025-06-03 06:00:00")
+    inputs = {"scores": {"wind_r": 0.4, "temperature_2m_z": 0.2}, "index": sample, "label": "Point anomaly"}
+    with PlotRenderer(str(tmp_path), workers=1) as renderer:
+        first = renderer.submit("tpa", sample, **inputs)
+        second = renderer.submit("tpa", sample, **{**inputs, "label": "Compound anomaly"})
+
+    assert os.path.basename(second).startswith("tpa_sample_20250603T06_")
+    assert " " not in second and ":" not in os.path.basename(second)
+    assert first != second
+    assert os.listdir(tmp_path) == [os.path.basename(second)]
@@ -1,25 +1,147 @@
-import requests
+import json
+import time
+import warnings
+import numpy as np
 import pandas as pd
+from utils.http_client import http_get
+
+try:
+    import orjson  # optional, faster JSON parsing of large archive payloads
+except ImportError:
+    orjson = None
+
+HOUR = np.timedelta64(60, "m")
+
+def parse_json(content: bytes) -> dict:
+    """Parse a JSON response body, using orjson when it is installed."""
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+def _decode_by_parsing(hourly: dict, dtype, deduplicate: bool) -> pd.DataFrame:
+    """Generic path: parse every ISO timestamp and optionally drop duplicated hours."""
+    df = pd.DataFrame({k: v for k, v in hourly.items() if k != "time"}).astype(dtype)
+    df.insert(0, "date", pd.to_datetime(hourly["time"]))
+    if deduplicate:
+        df.drop_duplicates(subset="date", keep="first", inplace=True)
+    return df.reset_index(drop=True)
+
+def _regular_hourly_index(times: list):
+    """
+    Derive the timestamps as start + k hours, or return None if the series is not a regular hourly run.
+
+    - Timestamps with a UTC offset are left to the parser, which keeps the offset.
+    - Every timestamp is converted in one vectorised NumPy call and compared exactly with the
+      arithmetic index, so any gap, duplicate or out-of-order hour falls back to parsing.
+    """
+    try:
+        with warnings.catch_warnings():
+            # NumPy only warns when it shifts timestamps with a UTC offset to UTC
+            warnings.simplefilter("error")
+            parsed = np.array(times, dtype="datetime64[m]")
+    except (ValueError, Warning):
+        return None
+    index = parsed[0] + np.arange(len(parsed), dtype="int64") * HOUR
+    if not np.array_equal(parsed, index):
+        return None
+    return index.astype("datetime64[ns]")
+
+def decode_hourly_payload(data: dict, dtype=np.float64, deduplicate: bool = True) -> pd.DataFrame:
+    """
+    Decodes an Open-Meteo JSON payload into a DataFrame with a 'date' column and one column per variable.
+
+    - Variable columns are built directly as `dtype` NumPy arrays; nulls become NaN. The float64
+      default keeps the API's values exactly, so fresh rows match rows read back from CSV
+      (utils/storage.py downcasts to float32 on save only when STORAGE_FLOAT32 is set).
+    - For a regular hourly series the dates are computed from the start time and a 1-hour step,
+      skipping per-string datetime parsing and duplicate removal.
+    - Irregular series (gaps, DST duplicates) fall back to the generic parse path, which drops
+      duplicated hours unless `deduplicate` is False.
+    """
+    if "hourly" not in data or "time" not in data["hourly"]:
+        raise ValueError("Malformed API response – missing 'hourly' or 'time'.")
+
+    hourly = data["hourly"]
+    if not hourly["time"]:
+        return pd.DataFrame(columns=["date"] + [k for k in hourly if k != "time"])
+
+    index = _regular_hourly_index(hourly["time"])
+    if index is None:
+        return _decode_by_parsing(hourly, dtype, deduplicate)
+
+    columns = {"date": index}
+    for name, values in hourly.items():
+        if name != "time":
+            columns[name] = np.asarray(values, dtype=dtype)
+    return pd.DataFrame(columns)
 
 def fetch_hourly_dataframe(url, params):
     """
     Fetches hourly weather data from the Open-Meteo API and returns it as a cleaned DataFrame.
 
-    - Parses JSON API response into a Pandas DataFrame.
-    - Renames time column to 'date' and parses as datetime.
+    - Requests go through the shared (cached) HTTP client.
+    - Decodes the payload via decode_hourly_payload (float64 columns, 'date' as datetime).
     - Removes any duplicate timestamps.
     """
 
-    response = requests.get(url, params=params)
+    response = http_get(url, params)
     response.raise_for_status()
-    data = response.json()
+    return decode_hourly_payload(parse_json(response.content))
 
+def fetch_site_dataframes(url, params, sites, deduplicate: bool = True) -> dict:
+    """
+    Fetches hourly data for several sites in one multi-location Open-Meteo request.
+
+    - `params` holds everything except the coordinates, which are sent as comma-separated lists.
+    - The API returns one payload per coordinate pair, in request order (a single object for one site).
+    - Returns a mapping of site id to DataFrame, decoded as in fetch_hourly_dataframe.
+    """
+    params = dict(params)
+    params["latitude"] = ",".join(str(site["latitude"]) for site in sites)
+    params["longitude"] = ",".join(str(site["longitude"]) for site in sites)
+
+    response = http_get(url, params)
+    response.raise_for_status()
+    payloads = parse_json(response.content)
+    if isinstance(payloads, dict):
+        payloads = [payloads]
+    if len(payloads) != len(sites):
+        raise ValueError(f"Expected {len(sites)} location payloads, received {len(payloads)}.")
+
+    return {site["id"]: decode_hourly_payload(payload, deduplicate=deduplicate) for site, payload in zip(sites, payloads)}
+
+def _legacy_decode(data: dict) -> pd.DataFrame:
+    """Previous decoding path, kept only as the benchmark baseline."""
     df = pd.DataFrame(data["hourly"])
     df.rename(columns={"time": "date"}, inplace=True)
-
-    # Since API already returns data in the requested timezone, just parse as-is
     df["date"] = pd.to_datetime(df["date"])
-
-    # Drop duplicate hourly records if any exist
     df.drop_duplicates(subset="date", keep="first", inplace=True)
-    return df
\ No newline at end of file
+    return df
+
+def benchmark_decoding(n_hours: int = 1441, repeats: int = 50) -> dict:
+    """
+    Time JSON parsing plus decoding for a synthetic payload of `n_hours`, legacy path vs fast path.
+
+    - Returns mean milliseconds per payload for each path.
+    """
+    dates = pd.date_range("2025-01-01", periods=n_hours, freq="h")
+    rng = np.random.default_rng(0)
+    payload = json.dumps({"hourly": {
+        "time": [d.strftime("%Y-%m-%dT%H:%M") for d in dates],
+        **{v: np.round(rng.normal(size=n_hours), 1).tolist()
+           for v in ["temperature_2m", "surface_pressure", "precipitation", "wind_speed_10m"]},
+    }}).encode()
+
+    results = {}
+    for name, decode in [("legacy", lambda c: _legacy_decode(json.loads(c))),
+                         ("fast", lambda c: decode_hourly_payload(parse_json(c)))]:
+        started = time.perf_counter()
+        for _ in range(repeats):
+            decode(payload)
+        results[name] = (time.perf_counter() - started) / repeats * 1000
+    return results
+
+if __name__ == "__main__":
+    # Microbenchmark: python -m utils.fetch_dataframe
+    for hours in (1441, 24 * 31, 24 * 365):
+        timings = benchmark_decoding(hours)
+        print(f"{hours:>5}h payload: legacy {timings['legacy']:.2f} ms, fast {timings['fast']:.2f} ms "
+              f"({timings['legacy'] / timings['fast']:.1f}x)")
@@ -0,0 +1,173 @@
+"""
+Month-partitioned, append-only store for IFS historical data.
+
+Each month lives in its own partition file (IFS_YYYY_MM.<ext>) under data/raw/historical,
+indexed by a JSON manifest recording the partition's file, time range and row count.
+Adding a month writes one partition and updates the manifest; readers use the manifest
+to prune partitions by time range and concatenate only what they need.
+
+Every function takes an optional `site_id`: the default site (None) uses data/raw/historical,
+other sites from the registry use data/sites/<site_id>/raw/historical (see utils/sites.py).
+"""
+
+import os
+import json
+import threading
+import pandas as pd
+from utils.find_root import find_project_root
+from utils.storage import save_dataframe, read_dataframe, list_artefacts
+from utils.sites import site_subdir
+
+PROJECT_ROOT = find_project_root()
+STORE_SUBDIR = os.path.join("raw", "historical")
+STORE_DIR = os.path.join(PROJECT_ROOT, "data", STORE_SUBDIR)
+MANIFEST_PATH = os.path.join(STORE_DIR, "_manifest.json")  # default site
+PARTITION_PREFIX = "IFS_"
+
+# Monthly ingestion appends partitions from several worker threads
+_manifest_lock = threading.Lock()
+
+def partition_key(year: int, month: int) -> str:
+    return f"{year}-{month:02d}"
+
+def store_subdir(site_id=None) -> str:
+    """Store location relative to /data for a site."""
+    return site_subdir(site_id, STORE_SUBDIR)
+
+def store_dir(site_id=None) -> str:
+    return os.path.join(PROJECT_ROOT, "data", store_subdir(site_id))
+
+def _manifest_path(site_id=None) -> str:
+    return os.path.join(store_dir(site_id), "_manifest.json")
+
+def load_manifest(site_id=None) -> dict:
+    """Load the partition manifest, or an empty one if the store has not been indexed yet."""
+    path = _manifest_path(site_id)
+    if not os.path.exists(path):
+        return {"partitions": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def _write_manifest(manifest: dict, site_id=None):
+    """Write the manifest atomically so readers never see a half-written index."""
+    os.makedirs(store_dir(site_id), exist_ok=True)
+    path = _manifest_path(site_id)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _partition_entry(df: pd.DataFrame, path: str) -> dict:
+    return {
+        "file": os.path.basename(path),
+        "start": df["date"].min().isoformat(),
+        "end": df["date"].max().isoformat(),
+        "rows": int(len(df)),
+        "mtime": os.path.getmtime(path),
+        "validated": False,
+    }
+
+def append_partition(df: pd.DataFrame, year: int, month: int, site_id=None) -> str:
+    """
+    Write one month as a partition and register it in the manifest.
+
+    - The partition is sorted by date on write, so readers never need a global sort.
+    - Returns the full path of the written partition.
+    """
+    df = df.sort_values("date").reset_index(drop=True)
+    path = save_dataframe(df, f"{PARTITION_PREFIX}{year}_{month:02d}", store_subdir(site_id))
+
+    with _manifest_lock:
+        manifest = load_manifest(site_id)
+        manifest["partitions"][partition_key(year, month)] = _partition_entry(df, path)
+        _write_manifest(manifest, site_id)
+    return path
+
+def sync_manifest(site_id=None) -> list:
+    """
+    Bring the manifest in line with the partition files on disk.
+
+    - Registers partitions that are new or were rewritten since they were indexed.
+    - Drops entries whose file no longer exists.
+    - Returns the keys of newly registered partitions.
+    """
+    with _manifest_lock:
+        manifest = load_manifest(site_id)
+        partitions = manifest["partitions"]
+        on_disk = {}
+        for path in list_artefacts(store_dir(site_id), prefix=PARTITION_PREFIX):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            year, month = stem[len(PARTITION_PREFIX):].split("_")
+            on_disk[partition_key(int(year), int(month))] = path
+
+        for key in [k for k in partitions if k not in on_disk]:
+            del partitions[key]
+
+        added = []
+        for key, path in sorted(on_disk.items()):
+            entry = partitions.get(key)
+            if entry and entry["file"] == os.path.basename(path) and entry["mtime"] == os.path.getmtime(path):
+                continue
+            df = read_dataframe(path)
+            partitions[key] = _partition_entry(df, path)
+            added.append(key)
+
+        if added or len(partitions) != len(on_disk):
+            _write_manifest(manifest, site_id)
+    return added
+
+def mark_validated(keys, site_id=None):
+    """Flag partitions as having passed through the integrity checks."""
+    with _manifest_lock:
+        manifest = load_manifest(site_id)
+        for key in keys:
+            if key in manifest["partitions"]:
+                manifest["partitions"][key]["validated"] = True
+        _write_manifest(manifest, site_id)
+
+def unvalidated_partitions(site_id=None) -> list:
+    """Keys of partitions that have not been integrity-checked since they were written."""
+    return [key for key, entry in sorted(load_manifest(site_id)["partitions"].items()) if not entry.get("validated")]
+
+def list_partitions(start=None, end=None, site_id=None) -> list:
+    """
+    Return manifest keys of partitions overlapping [start, end], in chronological order.
+
+    - Either bound may be None for an open range.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    keys = []
+    for key, entry in sorted(load_manifest(site_id)["partitions"].items()):
+        if start is not None and pd.Timestamp(entry["end"]) < start:
+            continue
+        if end is not None and pd.Timestamp(entry["start"]) > end:
+            continue
+        keys.append(key)
+    return keys
+
+def iter_history(start=None, end=None, columns=None, site_id=None):
+    """
+    Lazily yield partition DataFrames overlapping [start, end], oldest first.
+
+    - Only partitions whose manifest range overlaps the request are read from disk.
+    - Rows outside the range are trimmed from the boundary partitions.
+    """
+    partitions = load_manifest(site_id)["partitions"]
+    directory = store_dir(site_id)
+    for key in list_partitions(start, end, site_id):
+        df = read_dataframe(os.path.join(directory, partitions[key]["file"]))
+        if start is not None:
+            df = df[df["date"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["date"] <= pd.Timestamp(end)]
+        if columns is not None:
+            df = df[["date"] + [c for c in columns if c != "date"]]
+        yield df
+
+def load_history(start=None, end=None, columns=None, site_id=None) -> pd.DataFrame:
+    """Concatenate the pruned partitions for [start, end] into one chronologically ordered DataFrame."""
+    frames = list(iter_history(start, end, columns, site_id))
+    if not frames:
+        return pd.DataFrame(columns=["date"] + list(columns or []))
+    return pd.concat(frames, ignore_index=True)
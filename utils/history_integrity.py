@@ -0,0 +1,106 @@
+"""
+Vectorised integrity checks for hourly historical data.
+
+Checks a whole time range of the partitioned store in one pass over NumPy arrays and
+returns a structured report (gap ranges, duplicate timestamps, per-column NaN counts)
+that downstream code can consume directly instead of parsing the ingestion log.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from utils.find_root import find_project_root
+from utils.historical_store import load_history
+from utils.sites import site_dir
+
+PROJECT_ROOT = find_project_root()
+REPORT_PATH = os.path.join(PROJECT_ROOT, "data", "logs", "historical_integrity_report.json")
+
+HOUR_NS = np.int64(3600 * 10**9)
+
+def check_integrity(df: pd.DataFrame) -> dict:
+    """
+    Check an hourly DataFrame with a 'date' column for duplicates, gaps and missing values.
+
+    Returns a report dict with:
+    - 'start', 'end', 'rows': coverage of the checked data.
+    - 'duplicates': table of [date, occurrences] for timestamps seen more than once.
+    - 'gaps': table of [gap_start, gap_end, missing_hours] for every break in the hourly sequence.
+    - 'irregular_steps': table of [previous, date] for steps that are not whole hours.
+    - 'nan_counts': table of [column, nan_count] for every value column.
+    - 'total_duplicates', 'total_gaps', 'total_missing_hours', 'total_nans': headline counts.
+    """
+    dates = df["date"].to_numpy(dtype="datetime64[ns]")
+    if len(dates) > 1 and not df["date"].is_monotonic_increasing:
+        dates = np.sort(dates, kind="stable")
+
+    steps = np.diff(dates.view("int64"))
+    previous, current = dates[:-1], dates[1:]
+
+    # Duplicates: zero-length steps in the sorted sequence
+    dup_dates, dup_counts = np.unique(current[steps == 0], return_counts=True)
+    duplicates = pd.DataFrame({"date": dup_dates, "occurrences": dup_counts + 1})
+
+    # Gaps: steps longer than one hour; the missing range excludes both observed endpoints
+    gap_mask = steps > HOUR_NS
+    gaps = pd.DataFrame({
+        "gap_start": previous[gap_mask] + np.timedelta64(1, "h"),
+        "gap_end": current[gap_mask] - np.timedelta64(1, "h"),
+        "missing_hours": steps[gap_mask] // HOUR_NS - 1,
+    })
+
+    irregular_mask = (steps > 0) & (steps % HOUR_NS != 0)
+    irregular_steps = pd.DataFrame({"previous": previous[irregular_mask], "date": current[irregular_mask]})
+
+    nan_series = df.drop(columns="date").isna().sum()
+    nan_counts = pd.DataFrame({"column": nan_series.index, "nan_count": nan_series.to_numpy(dtype="int64")})
+
+    return {
+        "start": pd.Timestamp(dates[0]) if len(dates) else None,
+        "end": pd.Timestamp(dates[-1]) if len(dates) else None,
+        "rows": int(len(dates)),
+        "duplicates": duplicates,
+        "gaps": gaps,
+        "irregular_steps": irregular_steps,
+        "nan_counts": nan_counts,
+        "total_duplicates": int(dup_counts.sum()),
+        "total_gaps": int(len(gaps)),
+        "total_missing_hours": int(gaps["missing_hours"].sum()),
+        "total_nans": int(nan_counts["nan_count"].sum()),
+    }
+
+def validate_history(start=None, end=None, site_id=None) -> dict:
+    """Load [start, end] from a site's partitioned store and run check_integrity over it in one pass."""
+    return check_integrity(load_history(start, end, site_id=site_id))
+
+def report_to_dict(report: dict) -> dict:
+    """Convert a report to JSON-serialisable form (tables become lists of records, timestamps ISO strings)."""
+    out = {}
+    for key, value in report.items():
+        if isinstance(value, pd.DataFrame):
+            table = value.copy()
+            for col in table.select_dtypes(include="datetime").columns:
+                table[col] = table[col].dt.strftime("%Y-%m-%dT%H:%M:%S")
+            out[key] = table.to_dict(orient="records")
+        elif isinstance(value, pd.Timestamp):
+            out[key] = value.isoformat()
+        else:
+            out[key] = value
+    return out
+
+def report_path(site_id=None) -> str:
+    """Integrity report location for a site (REPORT_PATH for the default site)."""
+    return os.path.join(site_dir(site_id, "logs"), os.path.basename(REPORT_PATH))
+
+def save_report(report: dict, path: str = REPORT_PATH) -> str:
+    """Write a report as JSON (default: data/logs/historical_integrity_report.json) and return its path."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report_to_dict(report), f, indent=2, default=int)
+    return path
+
+if __name__ == "__main__":
+    # Full-history check: python -m utils.history_integrity
+    full_report = validate_history()
+    print(f"Saved integrity report for {full_report['rows']} rows to {save_report(full_report)}")
@@ -0,0 +1,269 @@
+"""
+Shared HTTP client for Open-Meteo requests.
+
+All ingestion scripts go through one pooled session. When requests-cache is available,
+responses are cached on disk (SQLite by default) with per-endpoint expiry: archive data
+is effectively immutable and kept for days, forecasts expire after minutes. Re-runs,
+backfills and anchor-time replays then reuse identical payloads instead of re-downloading.
+Archive requests ending within the API's lag (HTTP_CACHE_ARCHIVE_LAG_DAYS) are not final
+yet, so they bypass the cache and are neither served from nor written to it.
+
+Network calls are made resilient by:
+- a per-request timeout, capped by an optional per-run time budget (start_run_budget);
+- retries on connection errors, timeouts, 429 and 5xx, with exponential backoff and full jitter;
+- a circuit breaker that fails fast for a cool-down period after repeated consecutive failures,
+  then lets a single trial request through (half-open) and closes only once that trial succeeds;
+- latency and error counters, reported by fetch_metrics().
+"""
+
+import os
+import time
+import random
+import threading
+from datetime import date, datetime, timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from config.original_config import (
+    HISTORICAL_API_URL, FORECAST_API_URL, HISTORICAL_MAX_WORKERS,
+    HTTP_CACHE_ENABLED, HTTP_CACHE_BACKEND, HTTP_CACHE_ARCHIVE_TTL_HOURS, HTTP_CACHE_FORECAST_TTL_MINUTES,
+    HTTP_CACHE_ARCHIVE_LAG_DAYS,
+    HTTP_TIMEOUT, HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX,
+    HTTP_BREAKER_THRESHOLD, HTTP_BREAKER_COOLDOWN
+)
+from utils.find_root import find_project_root
+from utils.logger import log_event
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+CACHE_DIR = os.path.join(find_project_root(), "data", "cache")
+CACHE_NAME = os.path.join(CACHE_DIR, "open_meteo_http_cache")
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "retries": 0, "failures": 0, "breaker_trips": 0}
+_latencies = []
+_stats_lock = threading.Lock()
+
+# Circuit breaker and run budget state, shared by all worker threads
+_consecutive_failures = 0
+_breaker_open_until = 0.0
+_breaker_trial = False  # a half-open trial request is in flight
+_run_deadline = None
+
+class FetchError(Exception):
+    """Base class for errors raised by the resilient fetch layer."""
+
+class CircuitOpenError(FetchError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+class BudgetExceededError(FetchError):
+    """Raised when the per-run time budget has been used up."""
+
+def _url_pattern(url: str) -> str:
+    """requests-cache matches URL patterns without the scheme."""
+    return url.split("://", 1)[-1]
+
+def build_session(pool_size: int = HISTORICAL_MAX_WORKERS) -> requests.Session:
+    """
+    Create an HTTP session sized for `pool_size` concurrent workers.
+
+    - Returns a requests-cache CachedSession with per-endpoint TTLs when caching is enabled and installed.
+    - Falls back to a plain requests.Session otherwise.
+    """
+    if HTTP_CACHE_ENABLED and requests_cache is not None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        session = requests_cache.CachedSession(
+            cache_name=CACHE_NAME,
+            backend=HTTP_CACHE_BACKEND,
+            expire_after=requests_cache.DO_NOT_CACHE,  # only the endpoints below are cached
+            urls_expire_after={
+                _url_pattern(HISTORICAL_API_URL): timedelta(hours=HTTP_CACHE_ARCHIVE_TTL_HOURS),
+                _url_pattern(FORECAST_API_URL): timedelta(minutes=HTTP_CACHE_FORECAST_TTL_MINUTES),
+            },
+            allowable_codes=(200,),
+        )
+    else:
+        if HTTP_CACHE_ENABLED:
+            log_event("requests-cache is not installed; HTTP responses will not be cached.", module="http_client")
+        session = requests.Session()
+
+    pool_size = max(1, pool_size)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _is_provisional(url: str, params: dict) -> bool:
+    """
+    True for an archive request whose end_date is within HTTP_CACHE_ARCHIVE_LAG_DAYS of today (UTC).
+
+    - Such a response may still have missing or provisional hours, so it is sent with
+      'Cache-Control: no-store': always fetched, never stored by requests-cache.
+    """
+    if _url_pattern(url) != _url_pattern(HISTORICAL_API_URL) or not params.get("end_date"):
+        return False
+    end_date = date.fromisoformat(str(params["end_date"])[:10])
+    return end_date >= datetime.utcnow().date() - timedelta(days=HTTP_CACHE_ARCHIVE_LAG_DAYS)
+
+def get_session() -> requests.Session:
+    """Return the process-wide shared session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+def start_run_budget(seconds=None):
+    """
+    Start a total time budget for all requests in this run (None disables it).
+
+    - Request timeouts and backoff sleeps are capped by the remaining budget.
+    - Once it is spent, http_get raises BudgetExceededError instead of starting new requests.
+    """
+    global _run_deadline
+    _run_deadline = time.monotonic() + seconds if seconds is not None else None
+
+def _remaining_budget():
+    return None if _run_deadline is None else _run_deadline - time.monotonic()
+
+def _check_breaker() -> bool:
+    """
+    Raise CircuitOpenError while the breaker is open; return True if this request is the half-open trial.
+
+    - After the cool-down exactly one caller gets through as the trial; the others keep failing
+      fast until it succeeds (breaker closes) or fails (breaker re-opens for another cool-down).
+    """
+    global _breaker_trial
+    with _stats_lock:
+        if _consecutive_failures < HTTP_BREAKER_THRESHOLD:
+            return False
+        if time.monotonic() < _breaker_open_until:
+            raise CircuitOpenError(f"Circuit open after {HTTP_BREAKER_THRESHOLD} consecutive failures; failing fast.")
+        if _breaker_trial:
+            raise CircuitOpenError("Circuit half-open and a trial request is in flight; failing fast.")
+        _breaker_trial = True
+        return True
+
+def _end_trial():
+    """Release the half-open trial without a verdict (cache hit or non-network error)."""
+    global _breaker_trial
+    with _stats_lock:
+        _breaker_trial = False
+
+def _record_success(latency: float):
+    global _consecutive_failures, _breaker_trial
+    with _stats_lock:
+        _consecutive_failures = 0
+        _breaker_trial = False
+        _latencies.append(latency)
+
+def _record_failure():
+    global _consecutive_failures, _breaker_open_until, _breaker_trial
+    with _stats_lock:
+        _stats["failures"] += 1
+        _consecutive_failures += 1
+        _breaker_trial = False
+        if _consecutive_failures >= HTTP_BREAKER_THRESHOLD and time.monotonic() >= _breaker_open_until:
+            _breaker_open_until = time.monotonic() + HTTP_BREAKER_COOLDOWN
+            _stats["breaker_trips"] += 1
+            log_event(
+                f"WARNING: circuit breaker opened for {HTTP_BREAKER_COOLDOWN:.0f}s after {_consecutive_failures} consecutive failures",
+                module="http_client"
+            )
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(max, base * 2**attempt))."""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+def http_get(url: str, params: dict, timeout: float = HTTP_TIMEOUT) -> requests.Response:
+    """
+    GET through the shared session with retries, backoff, run budget and circuit breaker.
+
+    - Retries connection errors, timeouts and 429/5xx responses up to HTTP_MAX_RETRIES times.
+    - Other HTTP errors are returned to the caller as-is (callers use raise_for_status()).
+    - Raises CircuitOpenError / BudgetExceededError without waiting when the call cannot succeed in time.
+    """
+    headers = {"Cache-Control": "no-store"} if _is_provisional(url, params) else None
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        trial = _check_breaker()
+        remaining = _remaining_budget()
+        if remaining is not None and remaining <= 0:
+            if trial:
+                _end_trial()
+            raise BudgetExceededError("Run time budget exhausted before request could start.")
+        request_timeout = timeout if remaining is None else min(timeout, remaining)
+
+        started = time.monotonic()
+        try:
+            response = get_session().get(url, params=params, timeout=request_timeout, headers=headers)
+            error = None if response.status_code not in RETRY_STATUS_CODES else f"HTTP {response.status_code}"
+        except (requests.ConnectionError, requests.Timeout) as e:
+            response, error = None, e
+        except Exception:
+            if trial:
+                _end_trial()
+            raise
+
+        if error is None:
+            from_cache = getattr(response, "from_cache", False)
+            with _stats_lock:
+                _stats["hits" if from_cache else "misses"] += 1
+            if not from_cache:
+                _record_success(time.monotonic() - started)
+            elif trial:
+                _end_trial()
+            return response
+
+        _record_failure()
+        if attempt == HTTP_MAX_RETRIES:
+            break
+
+        delay = _backoff_delay(attempt)
+        remaining = _remaining_budget()
+        if remaining is not None and delay >= remaining:
+            raise BudgetExceededError(f"Run time budget exhausted while retrying {url}: {error}")
+        with _stats_lock:
+            _stats["retries"] += 1
+        time.sleep(delay)
+
+    if response is not None:
+        return response  # retryable status after the last attempt; let raise_for_status() report it
+    raise error
+
+def cache_stats() -> dict:
+    """Hit/miss counters since start-up (or the last reset), with the hit rate."""
+    with _stats_lock:
+        stats = {"hits": _stats["hits"], "misses": _stats["misses"]}
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / total if total else 0.0
+    return stats
+
+def fetch_metrics() -> dict:
+    """
+    Cache, retry, failure and breaker counters plus network latency statistics (seconds).
+
+    - Latencies only cover requests that reached the network and succeeded.
+    """
+    with _stats_lock:
+        metrics = dict(_stats)
+        latencies = sorted(_latencies)
+    metrics.update(cache_stats())
+    if latencies:
+        metrics["latency_mean"] = sum(latencies) / len(latencies)
+        metrics["latency_p50"] = latencies[len(latencies) // 2]
+        metrics["latency_p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        metrics["latency_max"] = latencies[-1]
+    return metrics
+
+def reset_fetch_metrics():
+    """Reset all counters and latency samples (the circuit breaker state is left alone)."""
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+        _latencies.clear()
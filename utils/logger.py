@@ -1,22 +1,139 @@
+"""
+Project-wide event logging.
+
+log_event() only timestamps the record and puts it on an in-memory queue; a background
+writer thread drains the queue in batches, appends them to the project log (rotating by size)
+and echoes them to the console.
+
+- LOG_FORMAT=text (default): data/logs/ingestion.log, one "[timestamp] [module] message" line
+  per record, exactly as before.
+- LOG_FORMAT=jsonl: data/logs/ingestion.jsonl, one JSON object per record with timestamp,
+  module, level, message and any extra keyword fields. Opt in once nothing parses the text log.
+"""
+
 import os
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
 from datetime import datetime
 import pytz
+from config.original_config import LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_FLUSH_INTERVAL
 from utils.find_root import find_project_root
 
 PROJECT_ROOT = find_project_root()
 LOG_DIR = os.path.join(PROJECT_ROOT, "data", "logs")
-LOG_FILE = os.path.join(LOG_DIR, "ingestion.log")
+LOG_FILE = os.path.join(LOG_DIR, "ingestion.jsonl" if LOG_FORMAT == "jsonl" else "ingestion.log")
+LOG_TIME_ZONE = pytz.timezone("Europe/London")
+MAX_BATCH = 500
+
+_queue = None
+_writer = None
+_writer_pid = None
+_start_lock = threading.Lock()
+
+def _infer_level(message: str) -> str:
+    """Map the message prefixes already used across the pipeline onto log levels."""
+    head = message[:8].upper()
+    if head.startswith("WARNING"):
+        return "WARNING"
+    if head.startswith("NOTICE"):
+        return "NOTICE"
+    if head.startswith("FAILED") or head.startswith("ERROR"):
+        return "ERROR"
+    return "INFO"
+
+def _rotate():
+    """Shift the log file -> .1 -> .2 ... keeping LOG_BACKUP_COUNT old files."""
+    for i in range(LOG_BACKUP_COUNT - 1, 0, -1):
+        src = f"{LOG_FILE}.{i}"
+        if os.path.exists(src):
+            os.replace(src, f"{LOG_FILE}.{i + 1}")
+    if LOG_BACKUP_COUNT > 0:
+        os.replace(LOG_FILE, f"{LOG_FILE}.1")
+    else:
+        os.remove(LOG_FILE)
+
+def _echo(line: str):
+    """Print to the console, replacing characters its encoding cannot show (e.g. PYTHONIOENCODING=ascii)."""
+    encoding = getattr(sys.stdout, "encoding", None) or "utf-8"
+    print(line.encode(encoding, errors="replace").decode(encoding))
+
+def _write_batch(batch):
+    lines, echoes = [], []
+    for created, module, level, message, fields in batch:
+        timestamp = datetime.fromtimestamp(created, LOG_TIME_ZONE).strftime("%Y-%m-%d %H:%M:%S %Z")
+        if LOG_FORMAT == "jsonl":
+            record = {"timestamp": timestamp, "module": module, "level": level, "message": message}
+            if fields:
+                record["fields"] = fields
+            lines.append(json.dumps(record, default=str))
+        else:
+            lines.append(f"[{timestamp}] [{module}] {message}")
+        echoes.append(f"[LOG - {module}] {message}")
 
-def log_event(message, module="general"):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) >= LOG_MAX_BYTES:
+        _rotate()
+    with open(LOG_FILE, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    for line in echoes:
+        _echo(line)
+
+def _drain(q):
+    """Writer loop: wait for a record, gather whatever else arrives within the flush interval, write once."""
+    while True:
+        batch = [q.get()]
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            # Keep the writer alive; losing a batch must not take logging down (or hang flush_logs at exit)
+            try:
+                _echo(f"[LOG - logger] Failed to write {len(batch)} log records: {e!r}")
+            except Exception:
+                pass
+        finally:
+            for _ in batch:
+                q.task_done()
+
+def _ensure_writer():
+    """Start the writer thread on first use (and again in a forked child, where threads do not survive)."""
+    global _queue, _writer, _writer_pid
+    if _writer_pid == os.getpid():
+        return
+    with _start_lock:
+        if _writer_pid == os.getpid():
+            return
+        _queue = queue.Queue()
+        _writer = threading.Thread(target=_drain, args=(_queue,), name="log-writer", daemon=True)
+        _writer.start()
+        _writer_pid = os.getpid()
+
+def flush_logs():
+    """Block until every queued record has been written."""
+    if _writer_pid == os.getpid():
+        _queue.join()
+
+atexit.register(flush_logs)
+
+def log_event(message, module="general", level=None, **fields):
     """
-    Logs events to a timestamped project log file in /data/logs.
+    Logs events to the project log file in /data/logs (text or JSON lines, see LOG_FORMAT).
 
-    - Each message is saved with local London time and module name.
-    - Also prints the log to console for visibility during execution.
+    - Each record holds local London time and module name; JSON lines also keep the level and any extra keyword fields.
+    - The level defaults to one inferred from the message prefix ('WARNING', 'Failed', ...).
+    - Records are written and printed to console by a background thread, so calls never block on I/O.
     """
-    os.makedirs(LOG_DIR, exist_ok=True)
-    london = pytz.timezone("Europe/London")
-    timestamp = datetime.now(london).strftime("%Y-%m-%d %H:%M:%S %Z")
-    with open(LOG_FILE, "a") as f:
-        f.write(f"[{timestamp}] [{module}] {message}\n")
-    print(f"[LOG - {module}] {message}")
+    _ensure_writer()
+    _queue.put((time.time(), module, level or _infer_level(message), message, fields))
@@ -1,70 +1,81 @@
 """
-Merge monthly IFS historical data into a single CSV.
-Assumes each monthly CSV has consistent hourly frequency in local timezone.
-Includes checks for duplicate timestamps, missing timestamps, and unexpected gaps.
+Maintain the month-partitioned IFS historical store (see utils/historical_store.py).
+Assumes each monthly partition has consistent hourly frequency in local timezone.
+Only partitions added or rewritten since the last run are indexed and checked (in one
+vectorised pass, see utils/history_integrity.py) for duplicate timestamps, missing
+values and unexpected gaps, so monthly maintenance costs O(1 month) rather than
+O(all history). The structured result is written to data/logs/historical_integrity_report.json.
+
+A single merged file (historical_IFS_merged_*) is only written on request (--export), for
+external consumers that still expect one; the notebooks read via load_history().
+
+Run as a script it maintains the store of every site in the registry (utils/sites.py).
 """
 
 import os
+import sys
 import pandas as pd
 from utils.logger import log_event
 from utils.find_root import find_project_root
+from utils.storage import save_dataframe
+from utils.history_integrity import validate_history, save_report, report_path
+from utils.sites import load_sites, site_subdir
+from utils.historical_store import (
+    STORE_DIR, load_manifest, sync_manifest, load_history, unvalidated_partitions, mark_validated
+)
 
 # Setup
 PROJECT_ROOT = find_project_root()
-HISTORICAL_DIR = os.path.join(PROJECT_ROOT, "data", "raw", "historical")
+HISTORICAL_DIR = STORE_DIR
 MERGED_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "historical_merged")
-os.makedirs(MERGED_DIR, exist_ok=True)
-
-def merge_historical():
-    log_event("Started merging historical data.", module="historical_merge")
 
-    files = sorted(f for f in os.listdir(HISTORICAL_DIR) if f.endswith(".csv"))
-    all_dfs = []
+def merge_historical(export: bool = False, site_id=None):
+    """Index a site's new partitions, integrity-check them and return the report (None if nothing was pending)."""
+    log_event(f"Started historical store update{f' for {site_id}' if site_id else ''}.", module="historical_merge")
 
-    total_duplicates = 0
-    total_nans = 0
-    total_gaps = 0
+    added = sync_manifest(site_id)
+    pending = unvalidated_partitions(site_id)
+    partitions = load_manifest(site_id)["partitions"]
 
-    for file in files:
-        path = os.path.join(HISTORICAL_DIR, file)
-        df = pd.read_csv(path, parse_dates=["date"])
+    if pending:
+        # One vectorised pass over the pending months, starting an hour early so a gap at the
+        # boundary with the previous partition is caught as well
+        range_start = pd.Timestamp(min(partitions[k]["start"] for k in pending)) - pd.Timedelta(hours=1)
+        range_end = max(partitions[k]["end"] for k in pending)
+        report = validate_history(range_start, range_end, site_id)
+        saved_report = save_report(report, report_path(site_id))
+    else:
+        report, saved_report = None, None
 
-        # Check for duplicated timestamps
-        duplicated = df.duplicated(subset=["date"]).sum()
-        if duplicated > 0:
-            log_event(f"NOTICE: {duplicated} duplicated timestamps in {file}. They will be KEPT.", module="historical_merge")
-            total_duplicates += duplicated
+    mark_validated(pending, site_id)
 
-        # Check for NaNs
-        nans = df.isna().sum().sum()
-        if nans > 0:
-            log_event(f"WARNING: {nans} missing values in {file}.", module="historical_merge")
-            total_nans += nans
+    # Final summary
+    log_event(f"SUMMARY: {len(added)} partitions indexed, {len(pending)} checked ({len(partitions)} total)", module="historical_merge")
+    if report is not None:
+        for gap in report["gaps"].itertuples():
+            log_event(f"WARNING: {gap.missing_hours} missing hours from {gap.gap_start} to {gap.gap_end}.", module="historical_merge")
+        log_event(f"SUMMARY: Total duplicated timestamps: {report['total_duplicates']}", module="historical_merge")
+        log_event(f"SUMMARY: Total missing values (NaNs): {report['total_nans']}", module="historical_merge")
+        log_event(f"SUMMARY: Total timestamp gaps: {report['total_gaps']} ({report['total_missing_hours']} hours)", module="historical_merge")
+        log_event(f"Integrity report saved to {saved_report}.", module="historical_merge")
 
-        # Check for timestamp gaps (should be 1 hour apart)
-        df_sorted = df.sort_values("date")
-        deltas = df_sorted["date"].diff().dropna()
-        gap_violations = (deltas != pd.Timedelta(hours=1)).sum()
-        if gap_violations > 0:
-            log_event(f"WARNING: {gap_violations} timestamp gaps in {file}.", module="historical_merge")
-            total_gaps += gap_violations
+    if export:
+        export_merged(site_id)
 
-        all_dfs.append(df_sorted)
+    log_event("Completed historical store update.", module="historical_merge")
+    return report
 
-    # Combine all monthly DataFrames and sort chronologically
-    merged_df = pd.concat(all_dfs).sort_values("date").reset_index(drop=True)
+def export_merged(site_id=None) -> str:
+    """Write a site's whole store as one historical_IFS_merged_<start>_to_<end> file for legacy consumers."""
+    merged_df = load_history(site_id=site_id)
 
     start = merged_df["date"].min().strftime("%Y%m")
     end = merged_df["date"].max().strftime("%Y%m")
-    output_file = f"historical_IFS_merged_{start}_to_{end}.csv"
-    output_path = os.path.join(MERGED_DIR, output_file)
-    merged_df.to_csv(output_path, index=False)
-
-    # Final summary
-    log_event(f"SUMMARY: Total duplicated timestamps: {total_duplicates}", module="historical_merge")
-    log_event(f"SUMMARY: Total missing values (NaNs): {total_nans}", module="historical_merge")
-    log_event(f"SUMMARY: Total timestamp gaps: {total_gaps}", module="historical_merge")
-    log_event(f"Completed historical merge and saved to {output_path}.", module="historical_merge")
+    output_file = f"historical_IFS_merged_{start}_to_{end}"
+    output_path = save_dataframe(merged_df, output_file, site_subdir(site_id, "processed/historical_merged"))
+    log_event(f"Exported merged historical data to {output_path}.", module="historical_merge")
+    return output_path
 
 if __name__ == "__main__":
-    merge_historical()
+    for site in load_sites():
+        merge_historical(export="--export" in sys.argv, site_id=site["id"])
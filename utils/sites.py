@@ -0,0 +1,78 @@
+"""
+Site registry for multi-location ingestion.
+
+Sites are read from the JSON file at SITES_FILE (see config/sites.example.json). Without
+a registry file the pipeline runs for the single configured LAT/LON site, as before.
+
+The default site (DEFAULT_SITE_ID) keeps the original file layout under data/; every other
+site gets its own tree under data/sites/<site_id>/ with the same sub-directories, so each
+site has its own historical partitions, rolling windows and forecasts.
+"""
+
+import os
+import json
+from config.original_config import LAT, LON, DEFAULT_SITE_ID, SITES_FILE
+from utils.find_root import find_project_root
+
+def default_site() -> dict:
+    """The single site configured through LAT/LON."""
+    return {"id": DEFAULT_SITE_ID, "name": DEFAULT_SITE_ID, "latitude": LAT, "longitude": LON}
+
+def load_sites(path: str = SITES_FILE) -> list:
+    """
+    Load the site registry.
+
+    - Each site is a dict with 'id', 'name', 'latitude' and 'longitude'; ids must be unique.
+    - Relative paths are resolved against the project root.
+    - Returns [default_site()] when the registry file does not exist.
+    """
+    if not os.path.isabs(path):
+        path = os.path.join(find_project_root(), path)
+    if not os.path.exists(path):
+        return [default_site()]
+
+    with open(path) as f:
+        entries = json.load(f)
+
+    sites, seen = [], set()
+    for entry in entries:
+        site = {
+            "id": str(entry["id"]),
+            "name": entry.get("name", str(entry["id"])),
+            "latitude": float(entry["latitude"]),
+            "longitude": float(entry["longitude"]),
+        }
+        if site["id"] in seen:
+            raise ValueError(f"Duplicate site id in {path}: {site['id']}")
+        seen.add(site["id"])
+        sites.append(site)
+    return sites
+
+def select_sites(site_ids=None, path: str = SITES_FILE) -> list:
+    """Return the registry sites matching `site_ids` (all sites if None), in registry order."""
+    sites = load_sites(path)
+    if site_ids is None:
+        return sites
+    unknown = set(site_ids) - {site["id"] for site in sites}
+    if unknown:
+        raise ValueError(f"Unknown site ids: {sorted(unknown)}")
+    return [site for site in sites if site["id"] in set(site_ids)]
+
+def site_subdir(site_id, subdir: str) -> str:
+    """
+    Map a data sub-directory (relative to /data) to its location for a site.
+
+    - The default site (or None) keeps the original path; other sites live under sites/<site_id>/.
+    """
+    if site_id is None or site_id == DEFAULT_SITE_ID:
+        return subdir
+    return os.path.join("sites", site_id, subdir)
+
+def site_dir(site_id, subdir: str) -> str:
+    """Absolute path of a site's data sub-directory."""
+    return os.path.join(find_project_root(), "data", site_subdir(site_id, subdir))
+
+def batched(sites: list, size: int) -> list:
+    """Split sites into consecutive batches of at most `size`, one multi-location request each."""
+    size = max(1, size)
+    return [sites[i:i + size] for i in range(0, len(sites), size)]
@@ -0,0 +1,120 @@
+"""
+Pluggable storage backend for pipeline artefacts.
+
+Supports CSV, Parquet and Arrow IPC (Feather v2) through a small format registry.
+CSV is the default (STORAGE_FORMAT). Columnar formats compress and keep datetime columns
+typed, so readers skip the CSV date-parsing step entirely; their float columns are only
+stored as float32 when STORAGE_FLOAT32 is set.
+"""
+
+import os
+import pandas as pd
+from config.original_config import STORAGE_FORMAT, STORAGE_COMPRESSION, STORAGE_FLOAT32
+from utils.find_root import find_project_root
+
+# name -> (extension, writer(df, path), reader(path, parse_dates))
+_FORMATS = {}
+
+def register_format(name: str, extension: str, writer, reader):
+    """Register a storage format so save_dataframe/read_dataframe can dispatch to it."""
+    _FORMATS[name] = (extension, writer, reader)
+
+def downcast_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of df with float64 columns stored as float32 (df itself unless STORAGE_FLOAT32)."""
+    if not STORAGE_FLOAT32:
+        return df
+    float_cols = df.select_dtypes(include="float64").columns
+    if len(float_cols) == 0:
+        return df
+    return df.astype({col: "float32" for col in float_cols})
+
+def _write_csv(df, path):
+    df.to_csv(path, index=False)
+
+def _read_csv(path, parse_dates):
+    header = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(path, parse_dates=[c for c in parse_dates if c in header])
+
+def _write_parquet(df, path):
+    downcast_floats(df).to_parquet(path, index=False, compression=STORAGE_COMPRESSION)
+
+def _read_parquet(path, parse_dates):
+    return pd.read_parquet(path)
+
+def _write_arrow(df, path):
+    # Feather v2 is the Arrow IPC file format; it only supports lz4/zstd compression
+    compression = STORAGE_COMPRESSION if STORAGE_COMPRESSION in ("lz4", "zstd") else "uncompressed"
+    downcast_floats(df).reset_index(drop=True).to_feather(path, compression=compression)
+
+def _read_arrow(path, parse_dates):
+    return pd.read_feather(path)
+
+register_format("csv", ".csv", _write_csv, _read_csv)
+register_format("parquet", ".parquet", _write_parquet, _read_parquet)
+register_format("arrow", ".arrow", _write_arrow, _read_arrow)
+
+def supported_extensions() -> tuple:
+    """File extensions of all registered formats."""
+    return tuple(ext for ext, _, _ in _FORMATS.values())
+
+def _format_for_path(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    for name, (extension, _, _) in _FORMATS.items():
+        if extension == ext:
+            return name
+    raise ValueError(f"Unsupported artefact extension: {ext}")
+
+def save_dataframe(df: pd.DataFrame, filename: str, subdir: str, fmt: str = None) -> str:
+    """
+    Saves a DataFrame under /data/<subdir> in the configured storage format.
+
+    - Any extension on `filename` is replaced by the extension of the chosen format.
+    - Returns the full file path after saving.
+    """
+    fmt = fmt or STORAGE_FORMAT
+    if fmt not in _FORMATS:
+        raise ValueError(f"Unknown storage format '{fmt}'. Available: {sorted(_FORMATS)}")
+    extension, writer, _ = _FORMATS[fmt]
+
+    output_dir = os.path.join(find_project_root(), "data", subdir)
+    os.makedirs(output_dir, exist_ok=True)
+    full_path = os.path.join(output_dir, os.path.splitext(filename)[0] + extension)
+    writer(df, full_path)
+    return full_path
+
+def read_dataframe(path: str, parse_dates=("date",)) -> pd.DataFrame:
+    """
+    Reads an artefact written by save_dataframe, choosing the reader from the file extension.
+
+    - CSV files have `parse_dates` columns parsed; columnar formats are already typed.
+    """
+    _, _, reader = _FORMATS[_format_for_path(path)]
+    return reader(path, list(parse_dates))
+
+def list_artefacts(directory: str, prefix: str = "") -> list:
+    """
+    Lists artefacts in a directory whose names start with `prefix`, in any registered format.
+
+    - If the same stem exists in several formats, only one path is kept (columnar preferred over CSV).
+    - Returned paths are sorted by stem.
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    preference = {ext: rank for rank, ext in enumerate((".parquet", ".arrow", ".csv"))}
+    by_stem = {}
+    for f in os.listdir(directory):
+        stem, ext = os.path.splitext(f)
+        if not f.startswith(prefix) or ext not in supported_extensions():
+            continue
+        current = by_stem.get(stem)
+        if current is None or preference.get(ext, 99) < preference.get(os.path.splitext(current)[1], 99):
+            by_stem[stem] = f
+    return [os.path.join(directory, by_stem[stem]) for stem in sorted(by_stem)]
+
+def find_artefact(directory: str, stem: str):
+    """Return the path of an artefact with the given stem in any registered format, or None."""
+    for path in list_artefacts(directory, prefix=stem):
+        if os.path.splitext(os.path.basename(path))[0] == stem:
+            return path
+    return None